@@ -1,13 +1,24 @@
 # config/config.py
 
 import os
-import subprocess
+import shlex
+from typing import Dict
+
+from config.docker_shell import DockerShell
 
 # Docker container name
 CONTAINER_NAME = "celestia-validator"
 
 # Namespace (10 bytes = 20 hex)
 NAMESPACE_ID = "0000004e46545a4f4e45"
+NAMESPACE_BYTES = bytes.fromhex(NAMESPACE_ID)  # also validates the hex at import
+if len(NAMESPACE_BYTES) != 10:
+    raise ValueError(f"NAMESPACE_ID must be 10 bytes (20 hex chars), got {NAMESPACE_ID!r}")
+
+# Celestia node endpoints (JSON-RPC and REST gateway) and its auth token
+NODE_RPC_URL = os.getenv("NODE_RPC_URL", "http://localhost:26658")
+NODE_API_URL = os.getenv("NODE_API_URL", "http://localhost:26659")
+AUTH_TOKEN = os.getenv("CELESTIA_AUTH_TOKEN", "")
 
 # Database path
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "nft.db")
@@ -15,24 +26,71 @@ DATABASE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "nft.db")
 # Indexer configuration
 START_HEIGHT = 1
 INDEXER_POLL_INTERVAL = 3
+PROCESSED_TX_RETENTION = 10000  # blocks of processed tx hashes kept for dedup
+
+# Origins allowed to call the API from a browser (comma-separated)
+FRONTEND_ORIGINS = os.getenv(
+    "FRONTEND_ORIGINS", "http://localhost:8000,http://127.0.0.1:8000"
+).split(",")
+
+
+# Resolved addresses (keys never change for a container's lifetime)
+_address_cache = {}
+
 
 # Get account address inside the Docker container
 def get_address(key_name: str) -> str:
+    address = _address_cache.get(key_name)
+    if address:
+        return address
     try:
-        result = subprocess.run(
-            f'docker exec {CONTAINER_NAME} celestia-appd keys show {key_name} -a --keyring-backend test',
-            shell=True, capture_output=True, text=True
+        result = DockerShell.get(CONTAINER_NAME).run(
+            shlex.join(['celestia-appd', 'keys', 'show', key_name, '-a', '--keyring-backend', 'test'])
         )
-        return result.stdout.strip()
-    except:
-        return f"celestia1{key_name}_placeholder"
+        address = result.stdout.strip()
+        if result.returncode == 0 and address:
+            # Only successful lookups are memoized, so a container that is
+            # still starting up doesn't pin the placeholder forever
+            _address_cache[key_name] = address
+            return address
+    except Exception:
+        pass
+    return f"celestia1{key_name}_placeholder"
+
+
+# Resolve several account addresses with one round-trip; the lookups run
+# concurrently inside the container
+def get_addresses(*key_names: str) -> Dict[str, str]:
+    missing = [k for k in dict.fromkeys(key_names) if not _address_cache.get(k)]
+    if missing:
+        lookups = ' '.join(
+            f"(printf '%s %s\\n' {q} \"$(celestia-appd keys show {q} -a --keyring-backend test 2>/dev/null)\") &"
+            for q in map(shlex.quote, missing)
+        )
+        try:
+            result = DockerShell.get(CONTAINER_NAME).run(f'{lookups} wait')
+            for line in result.stdout.splitlines():
+                key_name, _, address = line.partition(' ')
+                if key_name in missing and address.strip():
+                    _address_cache[key_name] = address.strip()
+        except Exception:
+            pass
+    return {k: _address_cache.get(k) or f"celestia1{k}_placeholder" for k in key_names}
+
+# Account addresses (resolved lazily on first access, see __getattr__)
+_ADDRESS_KEYS = {
+    'VALIDATOR_ADDRESS': 'validator',
+    'ALICE_ADDRESS': 'alice',
+    'BOB_ADDRESS': 'bob',
+    'ISSUER_ADDRESS': 'alice',
+}
 
-# Account addresses (retrieved at startup)
-VALIDATOR_ADDRESS = get_address('validator')
-ALICE_ADDRESS = get_address('alice')
-BOB_ADDRESS = get_address('bob')
 
-ISSUER_ADDRESS = ALICE_ADDRESS
+def __getattr__(name: str) -> str:
+    key_name = _ADDRESS_KEYS.get(name)
+    if key_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return get_address(key_name)
 
 # Gas configuration
 GAS_LIMIT = 200000
@@ -0,0 +1,120 @@
+# config/docker_shell.py
+
+import os
+import selectors
+import subprocess
+import threading
+import time
+import uuid
+from typing import Dict, Tuple
+
+
+class DockerShell:
+    """
+    Long-lived `docker exec -i <container> sh` session.
+
+    Commands are written to the shell's stdin and their output is framed
+    with a unique marker, so each call costs a pipe round-trip instead of
+    spawning a new `docker exec` process.
+    """
+
+    _instances: Dict[str, "DockerShell"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, container: str):
+        self.container = container
+        self._proc = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, container: str) -> "DockerShell":
+        """Get the shared session for a container"""
+        with cls._instances_lock:
+            shell = cls._instances.get(container)
+            if shell is None:
+                shell = cls._instances[container] = cls(container)
+            return shell
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            ['docker', 'exec', '-i', self.container, 'sh'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    def close(self):
+        """Terminate the session (a new one is started on next run)"""
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def run(self, cmd: str, timeout: float = 30) -> subprocess.CompletedProcess:
+        """Run a shell command inside the container"""
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+
+            marker = uuid.uuid4().hex
+            script = (
+                f"{{ {cmd}\n}} </dev/null\n"
+                f"printf '\\n{marker}:%d\\n' $?\n"
+                f"printf '\\n{marker}\\n' >&2\n"
+            )
+
+            try:
+                try:
+                    self._write(script)
+                except OSError:
+                    # The idle session died (e.g. container restart) before the
+                    # command was sent, so it is safe to resend on a fresh one
+                    self.close()
+                    self._start()
+                    self._write(script)
+                stdout, stderr, returncode = self._read_until(cmd, marker, timeout)
+            except Exception:
+                # The session state is unknown now, start fresh next time
+                self.close()
+                raise
+
+            return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    def _write(self, script: str):
+        self._proc.stdin.write(script.encode())
+        self._proc.stdin.flush()
+
+    def _read_until(self, cmd: str, marker: str, timeout: float) -> Tuple[str, str, int]:
+        """Read stdout/stderr until both end markers are seen"""
+        out_end = f"\n{marker}:".encode()
+        err_end = f"\n{marker}\n".encode()
+        buffers = {self._proc.stdout: b"", self._proc.stderr: b""}
+        deadline = time.monotonic() + timeout
+
+        with selectors.DefaultSelector() as sel:
+            sel.register(self._proc.stdout, selectors.EVENT_READ)
+            sel.register(self._proc.stderr, selectors.EVENT_READ)
+
+            while True:
+                out = buffers[self._proc.stdout]
+                err = buffers[self._proc.stderr]
+                idx = out.find(out_end)
+                if idx != -1 and out.endswith(b"\n", idx + len(out_end)) and err.endswith(err_end):
+                    returncode = int(out[idx + len(out_end):].strip())
+                    return (
+                        out[:idx].decode(errors='replace'),
+                        err[:-len(err_end)].decode(errors='replace'),
+                        returncode
+                    )
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+
+                for key, _ in sel.select(remaining):
+                    chunk = os.read(key.fileobj.fileno(), 65536)
+                    if not chunk:
+                        raise RuntimeError(
+                            f"Docker shell session closed: {buffers[self._proc.stderr].decode(errors='replace')}"
+                        )
+                    buffers[key.fileobj] += chunk
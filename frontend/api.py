@@ -1,68 +1,86 @@
 # frontend/api.py
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
-import sys
 import os
+import orjson
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from indexer.database import NFTDatabase
-from pydantic import BaseModel
-from typing import List, Optional
 from scripts.docker_blob_client import submit_collection
-import subprocess
+from config.config import get_address, get_addresses, FRONTEND_ORIGINS
+from frontend.cache import (
+    cached, http_cached, collection_cache, nft_cache, listing_cache, history_cache, stats_cache
+)
 
 app = FastAPI(
     title="Celestia NFT API",
     description="Sovereign NFT on Celestia DA - No Smart Contract",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# 允许跨域
+# 允许跨域：仅限配置的前端来源，预检结果让浏览器缓存一天
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type"],
+    max_age=86400,
 )
 
 # 静态文件目录
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+INDEX_PATH = os.path.join(STATIC_DIR, "index.html")
+
+# 首页在进程生命周期内不变，启动时读入内存
+_INDEX_BYTES: Optional[bytes] = None
+if os.path.exists(INDEX_PATH):
+    with open(INDEX_PATH, "rb") as f:
+        _INDEX_BYTES = f.read()
 
 db = NFTDatabase()
 
 
 class NFTItem(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     id: int
     metadata_uri: str
-    extra: dict = {}
+    extra: dict = Field(default_factory=dict)
 
 class CollectionCreateRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     collection_id: str
     name: str
     description: str = ""
     issuer: Optional[str] = None
-    nfts: List[NFTItem] = []
+    nfts: List[NFTItem] = Field(default_factory=list)
 
 
-# ============ 静态文件路由 ============
+@app.on_event("startup")
+async def warm_address_cache():
+    """预先（并发）解析常用账户地址，避免首个 POST /collections 请求变慢"""
+    await run_in_threadpool(get_addresses, 'alice', 'bob', 'validator')
 
-@app.get("/")
-async def root():
-    """返回前端页面"""
-    index_path = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    return {
-        "name": "Celestia NFT API",
-        "version": "1.0.0",
-        "message": "Frontend not found. API is running."
-    }
+
+@app.on_event("shutdown")
+def close_database():
+    """关闭数据库连接池"""
+    db.close()
+
+
+def _page_total(items: list, limit: Optional[int], offset: int, count) -> int:
+    """总数：未分页时直接用 len(items)，分页时走 SQL COUNT"""
+    if limit is None and offset == 0:
+        return len(items)
+    return count()
 
 
 # ============ API 路由 ============
@@ -84,9 +102,11 @@ async def api_info():
 
 
 @app.get("/collections/{collection_id}")
+@http_cached(max_age=5)
+@cached(collection_cache, key=lambda collection_id: ('info', collection_id))
 async def get_collection(collection_id: str):
     """获取集合信息"""
-    collection = db.get_collection(collection_id)
+    collection = db.get_collection(collection_id, with_raw_json=False)
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
     return {
@@ -100,21 +120,25 @@ async def get_collection(collection_id: str):
 
 
 @app.get("/collections/{collection_id}/nfts")
-async def get_collection_nfts(collection_id: str):
-    """获取集合中的所有 NFT"""
-    collection = db.get_collection(collection_id)
-    if not collection:
+@cached(nft_cache, key=lambda collection_id, limit, offset: ('collection', collection_id, limit, offset))
+async def get_collection_nfts(collection_id: str,
+                              limit: Optional[int] = Query(None, ge=1),
+                              offset: int = Query(0, ge=0)):
+    """获取集合中的 NFT（支持 limit/offset 分页）"""
+    if not db.collection_exists(collection_id):
         raise HTTPException(status_code=404, detail="Collection not found")
     
-    nfts = db.get_nfts_by_collection(collection_id)
+    nfts = db.get_nfts_by_collection(collection_id, limit, offset)
     return {
         "collection_id": collection_id,
-        "total": len(nfts),
+        "total": _page_total(nfts, limit, offset, lambda: db.count_nfts_by_collection(collection_id)),
         "nfts": nfts
     }
 
 
 @app.get("/nft/{collection_id}/{nft_id}")
+@http_cached(max_age=5)
+@cached(nft_cache, key=lambda collection_id, nft_id: (collection_id, nft_id))
 async def get_nft(collection_id: str, nft_id: int):
     """获取 NFT 详情"""
     nft = db.get_nft(collection_id, nft_id)
@@ -124,27 +148,41 @@ async def get_nft(collection_id: str, nft_id: int):
 
 
 @app.get("/owner/{address}")
-async def get_nfts_by_owner(address: str):
-    """获取某地址拥有的所有 NFT"""
-    nfts = db.get_nfts_by_owner(address)
+async def get_nfts_by_owner(address: str,
+                            limit: Optional[int] = Query(None, ge=1),
+                            offset: int = Query(0, ge=0),
+                            stream: bool = Query(False)):
+    """获取某地址拥有的 NFT（支持 limit/offset 分页；stream=1 时逐行输出 NDJSON）"""
+    if stream:
+        # 边读游标边输出，不在内存中拼完整结果
+        rows = db.iter_nfts_by_owner(address, limit, offset)
+        return StreamingResponse(
+            (orjson.dumps(nft) + b"\n" for nft in rows),
+            media_type="application/x-ndjson"
+        )
+    
+    nfts = db.get_nfts_by_owner(address, limit, offset)
     return {
         "owner": address,
-        "total": len(nfts),
+        "total": _page_total(nfts, limit, offset, lambda: db.count_nfts_by_owner(address)),
         "nfts": nfts
     }
 
 
 @app.get("/listings")
-async def get_all_listings():
-    """获取所有活跃挂单"""
-    listings = db.get_all_listings()
+@cached(listing_cache, key=lambda limit, offset: ('all', limit, offset))
+async def get_all_listings(limit: Optional[int] = Query(None, ge=1),
+                           offset: int = Query(0, ge=0)):
+    """获取活跃挂单（支持 limit/offset 分页）"""
+    listings = db.get_all_listings(limit, offset)
     return {
-        "total": len(listings),
+        "total": _page_total(listings, limit, offset, db.count_active_listings),
         "listings": listings
     }
 
 
 @app.get("/listing/{collection_id}/{nft_id}")
+@cached(listing_cache, key=lambda collection_id, nft_id: (collection_id, nft_id))
 async def get_listing(collection_id: str, nft_id: int):
     """获取 NFT 的活跃挂单"""
     listing = db.get_active_listing(collection_id, nft_id)
@@ -154,26 +192,27 @@ async def get_listing(collection_id: str, nft_id: int):
 
 
 @app.get("/history/{collection_id}/{nft_id}")
-async def get_transfer_history(collection_id: str, nft_id: int):
-    """获取 NFT 的转移历史"""
-    history = db.get_transfer_history(collection_id, nft_id)
+@http_cached(max_age=5)
+@cached(history_cache, key=lambda collection_id, nft_id, limit, offset: (collection_id, nft_id, limit, offset))
+async def get_transfer_history(collection_id: str, nft_id: int,
+                               limit: Optional[int] = Query(None, ge=1),
+                               offset: int = Query(0, ge=0)):
+    """获取 NFT 的转移历史（支持 limit/offset 分页）"""
+    history = db.get_transfer_history(collection_id, nft_id, limit, offset)
     return {
         "collection_id": collection_id,
         "nft_id": nft_id,
-        "total": len(history),
+        "total": _page_total(history, limit, offset,
+                             lambda: db.count_transfer_history(collection_id, nft_id)),
         "history": history
     }
 
 
 @app.get("/stats")
+@cached(stats_cache, key=lambda: 'stats')
 async def get_stats():
     """获取统计信息"""
-    return {
-        "last_indexed_height": db.get_last_indexed_height(),
-        "total_listings": len(db.get_all_listings()),
-        "collections": db.get_all_collections_count(),
-        "total_nfts": db.get_total_nfts_count()
-    }
+    return db.get_stats_bundle()
     
 @app.post("/collections")
 async def create_collection(req: CollectionCreateRequest):
@@ -185,12 +224,8 @@ async def create_collection(req: CollectionCreateRequest):
     # 默认 issuer 用 Alice（容器里的 alice 地址）
     issuer = req.issuer
     if not issuer:
-        # 获取 docker 容器内 alice 地址
-        result = subprocess.run(
-            'docker exec celestia-validator celestia-appd keys show alice -a --keyring-backend test',
-            shell=True, capture_output=True, text=True
-        )
-        issuer = result.stdout.strip()
+        # 获取 docker 容器内 alice 地址（在线程池中执行，避免阻塞事件循环）
+        issuer = await run_in_threadpool(get_address, 'alice')
     
     # 构造 collection JSON
     collection_data = {
@@ -200,19 +235,25 @@ async def create_collection(req: CollectionCreateRequest):
         "name": req.name,
         "description": req.description,
         "created_at_height": 0,
-        "nfts": [nft.dict() for nft in req.nfts],
+        "nfts": req.model_dump(include={'nfts'})['nfts'],
         "issuer_signature": "PLACEHOLDER"
     }
     
-    # 通过 Blob 写入链上
-    result = submit_collection(collection_data)
+    # 通过 Blob 写入链上（提交 + 等待确认可能需要数秒，放到线程池中）
+    result = await run_in_threadpool(submit_collection, collection_data)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to submit blob to Celestia")
     
-    # 可选：直接导入 DB，避免还要跑导入脚本
+    # 可选：直接导入 DB，避免还要跑导入脚本（写入可能要等 indexer 释放写锁，同样放到线程池中）
     height = result.get("height", 0)
     tx_hash = result.get("txhash", "")
-    db.create_collection(collection_data, height, tx_hash)
+    await run_in_threadpool(db.create_collection, collection_data, height, tx_hash)
+    
+    # 新集合已写入 DB，清理相关缓存
+    # 注意：只清理当前 worker 的缓存，其他 worker 只能等 TTL（5 秒）过期
+    collection_cache.pop(('info', req.collection_id))
+    collection_cache.pop('all')
+    stats_cache.clear()
     
     return {
         "status": "ok",
@@ -222,6 +263,7 @@ async def create_collection(req: CollectionCreateRequest):
     }
     
 @app.get("/collections")
+@cached(collection_cache, key=lambda: 'all')
 async def list_collections():
     """List all NFT collections"""
     collections = db.get_all_collections()
@@ -230,8 +272,29 @@ async def list_collections():
         "collections": collections
     }
 
+# ============ 静态文件路由 ============
+
+# 首页直接返回内存中的 index.html，不再每次 stat + open
+if _INDEX_BYTES is not None:
+    @app.get("/", include_in_schema=False)
+    async def root():
+        return Response(_INDEX_BYTES, media_type="text/html")
+
+# 其余前端资源：StaticFiles 必须在所有 API 路由之后挂载
+if os.path.isdir(STATIC_DIR):
+    app.mount("/", StaticFiles(directory=STATIC_DIR, html=True), name="static")
+
+
 # ============ 启动服务 ============
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # 多 worker：每个进程各自导入本模块，拥有独立的 db 连接池与缓存；
+    # 缓存失效不跨进程，worker 之间只靠 TTL 过期保持一致（见 frontend/cache.py，均为 5 秒以内）；
+    # 安装 uvicorn[standard] 后自动使用 uvloop + httptools
+    uvicorn.run(
+        "frontend.api:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("API_WORKERS", os.cpu_count() or 1))
+    )
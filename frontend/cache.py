@@ -0,0 +1,111 @@
+# frontend/cache.py
+
+import functools
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import orjson
+from fastapi import Request, Response
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[1] if item else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def cached(cache: TTLCache, key: Optional[Callable[..., Hashable]] = None):
+    """
+    Cache the result of an async endpoint.
+
+    `key` receives the endpoint arguments and returns the cache key;
+    exceptions (e.g. 404s) are not cached.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            value = cache.get(k, _MISSING)
+            if value is _MISSING:
+                value = await func(*args, **kwargs)
+                cache[k] = value
+            return value
+        return wrapper
+    return decorator
+
+
+def http_cached(max_age: int):
+    """
+    Add `ETag` / `Cache-Control` headers to a JSON endpoint and answer
+    `If-None-Match` revalidations with 304.
+
+    The ETag is a blake2b digest of the response body, so it changes
+    whenever the data does, regardless of what updated the database.
+    """
+    def decorator(func):
+        sig = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, request: Request, **kwargs):
+            body = orjson.dumps(await func(*args, **kwargs))
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers=headers)
+            return Response(body, media_type="application/json", headers=headers)
+
+        # Expose `request` to FastAPI's dependency injection
+        wrapper.__signature__ = sig.replace(parameters=[
+            *sig.parameters.values(),
+            inspect.Parameter('request', inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+        ])
+        return wrapper
+    return decorator
+
+
+# Per-endpoint caches: market data changes often. Collection info carries
+# total_supply, which the separate indexer process bumps on every mint, so
+# it gets the same short TTL as the NFT data
+collection_cache = TTLCache(maxsize=1000, ttl=5)
+nft_cache = TTLCache(maxsize=1000, ttl=5)
+listing_cache = TTLCache(maxsize=1000, ttl=2)
+history_cache = TTLCache(maxsize=1000, ttl=5)
+stats_cache = TTLCache(maxsize=1, ttl=2)
@@ -2,423 +2,872 @@
 SQLite Database Operations Module
 """
 import sqlite3
-import json
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import logging
+import orjson
+import queue
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Iterable, Callable, Tuple
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import DATABASE_PATH
 
+logger = logging.getLogger(__name__)
+
+# Max idle connections kept by each NFTDatabase
+POOL_SIZE = 8
+
+# bulk_apply commits after this many operations
+BULK_COMMIT_EVERY = 1000
+
+# Buffered processed-tx marks are written out once this many accumulate
+PROCESSED_FLUSH_SIZE = 500
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+CACHED_STATEMENTS = 256
+
+# Read pages straight from a memory map, up to this many bytes of the file
+MMAP_SIZE = 256 * 1024 * 1024
+
+# WAL file size kept after a checkpoint; larger WALs are truncated to this
+JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+# Page size for newly created database files (fewer, larger page faults)
+PAGE_SIZE = 32768
+
+# Rows sampled per index by PRAGMA optimize's ANALYZE runs
+ANALYSIS_LIMIT = 1000
+
+# zlib level for collections.raw_json (written once per collection, rarely read)
+JSON_COMPRESS_LEVEL = 6
+
+# Write statements shared by several methods; one SQL text per statement
+# means one entry in each connection's statement cache
+SQL_INSERT_NFT = '''
+    INSERT INTO nfts 
+    (collection_id, nft_id, metadata_uri, extra, owner, created_at_height, tx_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_INSERT_HISTORY = '''
+    INSERT INTO transfer_history
+    (collection_id, nft_id, from_address, to_address, tx_type, price, block_height, tx_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Secondary indexes (name -> DDL); with_bulk_load() drops and rebuilds them
+SECONDARY_INDEXES = {
+    'idx_nfts_owner': "CREATE INDEX IF NOT EXISTS idx_nfts_owner ON nfts(owner)",
+    # Serves get_active_listing's filter and its ORDER BY created_at
+    'idx_listings_active_created': '''
+        CREATE INDEX IF NOT EXISTS idx_listings_active_created
+        ON listings(collection_id, nft_id, created_at) WHERE status = 'active'
+    ''',
+    'idx_listings_status_created': '''
+        CREATE INDEX IF NOT EXISTS idx_listings_status_created
+        ON listings(status, created_at DESC)
+    ''',
+    'idx_transfer_history_nft': '''
+        CREATE INDEX IF NOT EXISTS idx_transfer_history_nft
+        ON transfer_history(collection_id, nft_id, block_height)
+    ''',
+    'idx_processed_txs_height': '''
+        CREATE INDEX IF NOT EXISTS idx_processed_txs_height
+        ON processed_txs(block_height)
+    ''',
+}
+
+# Explicit column lists (same order as the table definitions)
+NFT_COLUMNS = ("id, collection_id, nft_id, metadata_uri, extra, owner, status, "
+               "created_at_height, tx_hash, created_at")
+# Live supply, kept in the narrow collection_supply table (see _init_tables)
+SQL_SUPPLY = ("(SELECT total_supply FROM collection_supply s "
+              "WHERE s.collection_id = collections.collection_id)")
+COLLECTION_COLUMNS = ("collection_id, issuer, name, description, created_at_height, "
+                      f"{SQL_SUPPLY}, raw_json, tx_hash, created_at")
+COLLECTION_SUMMARY_COLUMNS = ("collection_id, issuer, name, description, created_at_height, "
+                              f"{SQL_SUPPLY}, tx_hash, created_at")
+LISTING_COLUMNS = ("id, collection_id, nft_id, seller, price, status, "
+                   "created_at_height, tx_hash, created_at")
+
+SQL_UPDATE_OWNER = '''
+    UPDATE nfts SET owner = ?, status = 'active' 
+    WHERE collection_id = ? AND nft_id = ? AND owner = ?
+    RETURNING 1
+'''
+
+SQL_SELECT_OWNER = "SELECT owner FROM nfts WHERE collection_id = ? AND nft_id = ?"
+
+SQL_COLLECTION_EXISTS = "SELECT 1 FROM collections WHERE collection_id = ? LIMIT 1"
+
+SQL_INSERT_COLLECTION = '''
+    INSERT INTO collections 
+    (collection_id, issuer, name, description, total_supply, created_at_height, raw_json, tx_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Insert only if the collection exists and the issuer matches;
+# an existing (collection_id, nft_id) is skipped, not raised
+SQL_MINT_NFT = '''
+    INSERT INTO nfts 
+    (collection_id, nft_id, metadata_uri, extra, owner, created_at_height, tx_hash)
+    SELECT ?, ?, ?, ?, ?, ?, ?
+    WHERE EXISTS (SELECT 1 FROM collections WHERE collection_id = ? AND issuer = ?)
+    ON CONFLICT (collection_id, nft_id) DO NOTHING
+'''
+
+# Close the NFT's active listing with the given final status (sold / cancelled)
+SQL_CLOSE_LISTING = '''
+    UPDATE listings SET status = ? 
+    WHERE collection_id = ? AND nft_id = ? AND status = 'active'
+'''
+
+SQL_INSERT_LISTING = '''
+    INSERT INTO listings 
+    (collection_id, nft_id, seller, price, created_at_height, tx_hash, metadata_uri)
+    SELECT ?, ?, ?, ?, ?, ?, metadata_uri
+    FROM nfts WHERE collection_id = ? AND nft_id = ?
+'''
+
+# Set the NFT's status (listed / active), only if the given address owns it
+SQL_SET_NFT_STATUS = '''
+    UPDATE nfts SET status = ? 
+    WHERE collection_id = ? AND nft_id = ? AND owner = ?
+    RETURNING 1
+'''
+
+# Close the active listing as sold and return what the buyer pays whom
+SQL_SELL_LISTING = '''
+    UPDATE listings SET status = 'sold' 
+    WHERE collection_id = ? AND nft_id = ? AND status = 'active'
+    RETURNING seller, price
+'''
+
+SQL_MINT_FAILURE_REASON = '''
+    SELECT
+        (SELECT issuer FROM collections WHERE collection_id = ?),
+        EXISTS (SELECT 1 FROM nfts WHERE collection_id = ? AND nft_id = ?)
+'''
+
+
+def _sql_limit(limit: Optional[int]) -> int:
+    """Map an optional limit to SQLite's LIMIT (negative = no limit)"""
+    return -1 if limit is None else limit
+
+
+def _json_dumps(obj: Any) -> str:
+    """Serialize to a JSON string for TEXT columns (orjson, stdlib-compatible keys)"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _json_pack(obj: Any) -> bytes:
+    """Serialize to a zlib-compressed JSON BLOB (for large, rarely read documents)"""
+    return zlib.compress(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS), JSON_COMPRESS_LEVEL)
+
+
+def _json_unpack(value) -> Any:
+    """Inverse of _json_pack; TEXT values written before compression load as-is"""
+    if isinstance(value, bytes):
+        value = zlib.decompress(value)
+    return orjson.loads(value)
+
+
+@dataclass(slots=True)
+class NFTRow:
+    """One row of the nfts table (slotted: no per-row __dict__)"""
+    id: int
+    collection_id: str
+    nft_id: int
+    metadata_uri: str
+    extra: Dict
+    owner: str
+    status: str
+    created_at_height: int
+    tx_hash: Optional[str]
+    created_at: str
+    
+    @classmethod
+    def from_row(cls, row: tuple) -> "NFTRow":
+        """Build from a `SELECT {NFT_COLUMNS} FROM nfts` tuple"""
+        return cls(row[0], row[1], row[2], row[3],
+                   orjson.loads(row[4]) if row[4] else {},
+                   row[5], row[6], row[7], row[8], row[9])
 
 
 class NFTDatabase:
-    def __init__(self, db_path: str = DATABASE_PATH):
+    def __init__(self, db_path: str = DATABASE_PATH, pool_size: int = POOL_SIZE):
         self.db_path = db_path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._processed = None  # tx hashes already processed, loaded on first use
+        self._pending_txs = []  # (tx_hash, height) not yet written to processed_txs
+        self._processed_lock = threading.Lock()
+        self._local = threading.local()  # .batch: connection of an active bulk_apply
+        self._writer = None  # dedicated write connection, see write_conn()
+        self._write_lock = threading.RLock()
         self._ensure_dir()
         self._init_tables()
     
+    @property
+    def is_file_db(self) -> bool:
+        """False for in-memory / temporary databases (no WAL, no directory)"""
+        return self.db_path not in ('', ':memory:') and not self.db_path.startswith('file:')
+    
     def _ensure_dir(self):
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        directory = os.path.dirname(self.db_path)
+        if self.is_file_db and directory:
+            os.makedirs(directory, exist_ok=True)
     
-    def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        if readonly and self.is_file_db:
+            # Pool connections only read; mode=ro makes SQLite enforce that
+            uri = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        # Writers from the API and the indexer wait for each other instead of failing
+        conn.execute("PRAGMA busy_timeout=5000")
+        # Truncate the WAL back down after checkpoints (a bulk sync can grow it a lot)
+        conn.execute(f"PRAGMA journal_size_limit={JOURNAL_SIZE_LIMIT}")
+        return conn
     
-    def _init_tables(self):
-        """Initialize database tables"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        # Collections table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS collections (
-                collection_id TEXT PRIMARY KEY,
-                issuer TEXT NOT NULL,
-                name TEXT NOT NULL,
-                description TEXT,
-                created_at_height INTEGER NOT NULL,
-                total_supply INTEGER DEFAULT 0,
-                raw_json TEXT NOT NULL,
-                tx_hash TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # NFT table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nfts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                collection_id TEXT NOT NULL,
-                nft_id INTEGER NOT NULL,
-                metadata_uri TEXT,
-                extra TEXT,
-                owner TEXT NOT NULL,
-                status TEXT DEFAULT 'active',  -- active, listed, burned
-                created_at_height INTEGER NOT NULL,
-                tx_hash TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(collection_id, nft_id),
-                FOREIGN KEY (collection_id) REFERENCES collections(collection_id)
-            )
-        ''')
-        
-        # Listings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS listings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                collection_id TEXT NOT NULL,
-                nft_id INTEGER NOT NULL,
-                seller TEXT NOT NULL,
-                price INTEGER NOT NULL,  -- utia
-                status TEXT DEFAULT 'active',  -- active, sold, cancelled
-                created_at_height INTEGER NOT NULL,
-                tx_hash TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (collection_id) REFERENCES collections(collection_id)
-            )
-        ''')
-        
-        # Transfer history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transfer_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                collection_id TEXT NOT NULL,
-                nft_id INTEGER NOT NULL,
-                from_address TEXT NOT NULL,
-                to_address TEXT NOT NULL,
-                tx_type TEXT NOT NULL,  -- mint, transfer, sale
-                price INTEGER,
-                block_height INTEGER NOT NULL,
-                tx_hash TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Indexer state table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS indexer_state (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Processed transactions table (prevent duplicate processing)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS processed_txs (
-                tx_hash TEXT PRIMARY KEY,
-                block_height INTEGER NOT NULL,
-                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print(f"✅ Database initialized: {self.db_path}")
+    @contextmanager
+    def conn(self):
+        """Borrow a read-only connection from the pool (opened on demand)"""
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            # Inside bulk_apply every call shares the batch transaction
+            yield batch
+            return
+        if not self.is_file_db:
+            # Every connection to ':memory:' / '' opens its own empty database,
+            # so reads share the write connection (no pool, no WAL)
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = self._connect()
+                yield self._writer
+            return
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect(readonly=True)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
     
-    # ================== Collection Operations ==================
+    @contextmanager
+    def write_conn(self):
+        """
+        Borrow the single write connection. Writers in this process queue on
+        a lock instead of spinning in SQLite's busy handler; readers keep
+        using the pool and are not blocked (WAL).
+        """
+        with self._write_lock:
+            batch = getattr(self._local, 'batch', None)
+            if batch is not None:
+                yield batch
+                return
+            if self._writer is None:
+                self._writer = self._connect()
+            try:
+                yield self._writer
+            finally:
+                if self._writer.in_transaction:
+                    self._writer.rollback()
     
-    def create_collection(self, collection_data: Dict, height: int, tx_hash: str = None) -> bool:
-        """Create NFT collection"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
+    @staticmethod
+    def _optimize(conn: sqlite3.Connection):
+        """
+        Refresh planner statistics for tables that changed a lot since the
+        last ANALYZE (PRAGMA optimize skips the rest; analysis_limit keeps
+        each table's pass bounded on large tables)
+        """
+        conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+    
+    def close(self):
+        """Flush buffered marks and close every connection (for shutdown)"""
+        self.flush_processed()
+        with self._write_lock:
+            if self._writer is not None:
+                self._optimize(self._writer)
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def _commit(self, conn: sqlite3.Connection):
+        """Commit, unless inside bulk_apply (which commits once at the end)"""
+        if conn is not getattr(self._local, 'batch', None):
+            conn.commit()
+    
+    def _rollback(self, conn: sqlite3.Connection):
+        """Roll back, unless inside bulk_apply (which uses per-operation savepoints)"""
+        if conn is not getattr(self._local, 'batch', None):
+            conn.rollback()
+    
+    def bulk_apply(self, operations: Iterable[Callable[[], bool]],
+                   commit_every: int = BULK_COMMIT_EVERY) -> List[bool]:
+        """
+        Run many write operations (e.g. a whole block of events) in one
+        transaction per `commit_every` operations, so the commit/fsync cost
+        is paid once per batch while the write lock and the WAL stay bounded.
         
+        Each operation is a callable that uses this database's methods and
+        returns success; a failed operation is rolled back to its own
+        savepoint without affecting the others.
+        
+        Processed-tx marks made during the batch are written in the same
+        transaction, so they commit (or vanish) together with the data.
+        """
+        self.flush_processed()
+        results = []
+        with self.write_conn() as conn:
+            self._local.batch = conn
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for operation in operations:
+                    if len(results) and len(results) % commit_every == 0:
+                        self.flush_processed()
+                        conn.commit()
+                        conn.execute("BEGIN IMMEDIATE")
+                    conn.execute("SAVEPOINT bulk_op")
+                    try:
+                        success = bool(operation())
+                    except Exception as e:
+                        logger.error("❌ Bulk operation failed: %s", e)
+                        success = False
+                    if not success:
+                        conn.execute("ROLLBACK TO bulk_op")
+                    conn.execute("RELEASE bulk_op")
+                    results.append(success)
+                self.flush_processed()
+                conn.commit()
+            except BaseException:
+                # The open batch was not committed: forget its marks too,
+                # the set is reloaded from processed_txs on next use
+                with self._processed_lock:
+                    self._processed = None
+                    self._pending_txs = []
+                raise
+            finally:
+                self._local.batch = None
+            self._optimize(conn)
+        return results
+    
+    @contextmanager
+    def with_bulk_load(self):
+        """
+        Drop the secondary indexes for the duration of a bulk load (e.g. the
+        initial sync) and rebuild them afterwards, one sorted pass per index
+        instead of an index update per inserted row
+        """
+        self.flush_processed()
+        with self.write_conn() as conn:
+            for name in SECONDARY_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+            conn.commit()
         try:
-            # Check if already exists
-            cursor.execute(
-                "SELECT collection_id FROM collections WHERE collection_id = ?",
-                (collection_data['collection_id'],)
-            )
-            if cursor.fetchone():
-                print(f"⚠️ Collection already exists: {collection_data['collection_id']}")
-                return False
+            yield self
+        finally:
+            self.flush_processed()
+            with self.write_conn() as conn:
+                for sql in SECONDARY_INDEXES.values():
+                    conn.execute(sql)
+                conn.execute("ANALYZE")
+                conn.commit()
+    
+    def _init_tables(self):
+        """Initialize database tables"""
+        with self.write_conn() as conn:
+            # Both must precede table creation (no effect on existing files);
+            # auto_vacuum lets prune_processed_txs hand pages back
+            conn.execute(f"PRAGMA page_size={PAGE_SIZE}")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL lets readers (API) proceed while the indexer writes; persistent per DB file
+            if self.is_file_db:
+                conn.execute("PRAGMA journal_mode=WAL")
+            cursor = conn.cursor()
+            
+            # Collections table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS collections (
+                    collection_id TEXT PRIMARY KEY,
+                    issuer TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    created_at_height INTEGER NOT NULL,
+                    total_supply INTEGER DEFAULT 0,  -- supply at creation, live count in collection_supply
+                    raw_json BLOB NOT NULL,  -- zlib-compressed JSON
+                    tx_hash TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
             
-            # Insert collection
+            # NFT table
             cursor.execute('''
-                INSERT INTO collections 
-                (collection_id, issuer, name, description, created_at_height, raw_json, tx_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                collection_data['collection_id'],
-                collection_data['issuer'],
-                collection_data['name'],
-                collection_data.get('description', ''),
-                height,
-                json.dumps(collection_data),
-                tx_hash
-            ))
+                CREATE TABLE IF NOT EXISTS nfts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection_id TEXT NOT NULL,
+                    nft_id INTEGER NOT NULL,
+                    metadata_uri TEXT,
+                    extra TEXT,
+                    owner TEXT NOT NULL,
+                    status TEXT DEFAULT 'active',  -- active, listed, burned
+                    created_at_height INTEGER NOT NULL,
+                    tx_hash TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(collection_id, nft_id),
+                    FOREIGN KEY (collection_id) REFERENCES collections(collection_id)
+                )
+            ''')
             
-            # If contains initial NFTs, create them
-            nfts = collection_data.get('nfts', [])
-            for nft in nfts:
+            # Listings table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS listings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection_id TEXT NOT NULL,
+                    nft_id INTEGER NOT NULL,
+                    seller TEXT NOT NULL,
+                    price INTEGER NOT NULL,  -- utia
+                    status TEXT DEFAULT 'active',  -- active, sold, cancelled
+                    created_at_height INTEGER NOT NULL,
+                    tx_hash TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    metadata_uri TEXT,  -- copied from nfts, so listing pages need no JOIN
+                    FOREIGN KEY (collection_id) REFERENCES collections(collection_id)
+                )
+            ''')
+            # Databases from before listings.metadata_uri: add and backfill it
+            cursor.execute("SELECT 1 FROM pragma_table_info('listings') WHERE name = 'metadata_uri'")
+            if cursor.fetchone() is None:
+                cursor.execute("ALTER TABLE listings ADD COLUMN metadata_uri TEXT")
                 cursor.execute('''
-                    INSERT INTO nfts 
-                    (collection_id, nft_id, metadata_uri, extra, owner, created_at_height, tx_hash)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    collection_data['collection_id'],
-                    nft['id'],
-                    nft.get('metadata_uri', ''),
-                    json.dumps(nft.get('extra', {})),
-                    collection_data['issuer'],  # Initial owner is the issuer
-                    height,
-                    tx_hash
+                    UPDATE listings SET metadata_uri = (
+                        SELECT metadata_uri FROM nfts n
+                        WHERE n.collection_id = listings.collection_id AND n.nft_id = listings.nft_id
+                    )
+                ''')
+            
+            # Transfer history table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS transfer_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection_id TEXT NOT NULL,
+                    nft_id INTEGER NOT NULL,
+                    from_address TEXT NOT NULL,
+                    to_address TEXT NOT NULL,
+                    tx_type TEXT NOT NULL,  -- mint, transfer, sale
+                    price INTEGER,
+                    block_height INTEGER NOT NULL,
+                    tx_hash TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Indexer state table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indexer_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Processed transactions table (prevent duplicate processing)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS processed_txs (
+                    tx_hash TEXT PRIMARY KEY,
+                    block_height INTEGER NOT NULL,
+                    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Data files already imported, so a restart skips unchanged files.
+            # tx_hash keeps the file's processed_txs entry from being pruned:
+            # a changed file is imported again and must still be deduped
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS imported_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    tx_hash TEXT
+                ) WITHOUT ROWID
+            ''')
+            # Databases from before imported_files.tx_hash: existing rows stay
+            # NULL until their file is imported again
+            cursor.execute("SELECT 1 FROM pragma_table_info('imported_files') WHERE name = 'tx_hash'")
+            if cursor.fetchone() is None:
+                cursor.execute("ALTER TABLE imported_files ADD COLUMN tx_hash TEXT")
+            
+            # Live supply per collection. It lives in its own narrow table so a
+            # mint rewrites a tiny row instead of the collection row (raw_json)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS collection_supply (
+                    collection_id TEXT PRIMARY KEY,
+                    total_supply INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            # Databases from before collection_supply kept the count in collections
+            cursor.execute('''
+                INSERT OR IGNORE INTO collection_supply (collection_id, total_supply)
+                SELECT collection_id, total_supply FROM collections
+            ''')
+            cursor.execute("DROP TRIGGER IF EXISTS trg_nfts_supply")
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_collection_supply AFTER INSERT ON nfts
+                BEGIN
+                    UPDATE collection_supply SET total_supply = total_supply + 1
+                    WHERE collection_id = NEW.collection_id;
+                END
+            ''')
+            
+            # Row counters in indexer_state (seeded once from the current tables),
+            # so the dashboard counts don't scan whole tables
+            for key, table in (('nft_count', 'nfts'), ('collection_count', 'collections')):
+                cursor.execute(
+                    f"INSERT OR IGNORE INTO indexer_state (key, value) SELECT '{key}', COUNT(*) FROM {table}"
+                )
+                for event, delta in (('INSERT', '+ 1'), ('DELETE', '- 1')):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_{key}_{event.lower()} AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE indexer_state SET value = CAST(value AS INTEGER) {delta}
+                            WHERE key = '{key}';
+                        END
+                    ''')
+            
+            # Indexes for the hot lookups (owner pages, active listings, history);
+            # idx_listings_active was superseded by idx_listings_active_created,
+            # idx_nfts_cover (for the old listings JOIN) by listings.metadata_uri
+            cursor.execute("DROP INDEX IF EXISTS idx_listings_active")
+            cursor.execute("DROP INDEX IF EXISTS idx_nfts_cover")
+            for sql in SECONDARY_INDEXES.values():
+                cursor.execute(sql)
+            
+            # Give the query planner statistics the first time around
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                cursor.execute("ANALYZE")
+            
+            conn.commit()
+        logger.info("✅ Database initialized: %s", self.db_path)
+    
+    # ================== Collection Operations ==================
+    
+    def create_collection(self, collection_data: Dict, height: int, tx_hash: str = None) -> bool:
+        """Create NFT collection"""
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                collection_id = collection_data['collection_id']
+                issuer = collection_data['issuer']
+                
+                # Check if already exists
+                cursor.execute(SQL_COLLECTION_EXISTS, (collection_id,))
+                if cursor.fetchone() is not None:
+                    logger.warning("⚠️ Collection already exists: %s", collection_id)
+                    return False
+                
+                # If contains initial NFTs, create them. executemany pulls the
+                # parameter tuples from the generators one at a time, so no
+                # second copy of the collection is built in memory.
+                # They go in before the supply row, so trg_collection_supply finds
+                # nothing to update and the supply is written once below.
+                nfts = collection_data.get('nfts', [])
+                cursor.executemany(SQL_INSERT_NFT, (
+                    (
+                        collection_id,
+                        nft['id'],
+                        nft.get('metadata_uri', ''),
+                        _json_dumps(nft.get('extra', {})),
+                        issuer,  # Initial owner is the issuer
+                        height,
+                        tx_hash
+                    )
+                    for nft in nfts
                 ))
                 
-                # Record mint history
+                # Record mint history straight from the rows just inserted
+                # (one statement, no second pass over the NFTs in Python)
                 cursor.execute('''
                     INSERT INTO transfer_history
-                    (collection_id, nft_id, from_address, to_address, tx_type, block_height, tx_hash)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    collection_data['collection_id'],
-                    nft['id'],
-                    "GENESIS",
-                    collection_data['issuer'],
-                    "mint",
+                    (collection_id, nft_id, from_address, to_address, tx_type, price, block_height, tx_hash)
+                    SELECT collection_id, nft_id, 'GENESIS', owner, 'mint', NULL, created_at_height, tx_hash
+                    FROM nfts WHERE collection_id = ?
+                    ORDER BY nft_id
+                ''', (collection_id,))
+                
+                # Insert collection
+                cursor.execute(SQL_INSERT_COLLECTION, (
+                    collection_id,
+                    issuer,
+                    collection_data['name'],
+                    collection_data.get('description', ''),
+                    len(nfts),
                     height,
+                    _json_pack(collection_data),
                     tx_hash
                 ))
-            
-            # Update total supply
-            cursor.execute('''
-                UPDATE collections SET total_supply = ? WHERE collection_id = ?
-            ''', (len(nfts), collection_data['collection_id']))
-            
-            conn.commit()
-            print(f"✅ Collection created successfully: {collection_data['collection_id']}, NFT count: {len(nfts)}")
-            return True
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Failed to create collection: {e}")
-            return False
-        finally:
-            conn.close()
-    
-    def get_collection(self, collection_id: str) -> Optional[Dict]:
-        """Get collection info"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM collections WHERE collection_id = ?",
-            (collection_id,)
-        )
-        row = cursor.fetchone()
-        conn.close()
+                cursor.execute(
+                    "INSERT INTO collection_supply (collection_id, total_supply) VALUES (?, ?)",
+                    (collection_id, len(nfts))
+                )
+                
+                self._commit(conn)
+                if conn is not getattr(self._local, 'batch', None):
+                    # A large collection can shift the nfts statistics a lot
+                    self._optimize(conn)
+                logger.info("✅ Collection created successfully: %s, NFT count: %d", collection_id, len(nfts))
+                return True
+                
+            except Exception as e:
+                self._rollback(conn)
+                logger.error("❌ Failed to create collection: %s", e)
+                return False
+    
+    def get_collection(self, collection_id: str, with_raw_json: bool = True) -> Optional[Dict]:
+        """
+        Get collection info. raw_json holds the whole deploy document (every
+        NFT included), so callers that only need the summary fields should
+        pass with_raw_json=False to skip reading and parsing it.
+        """
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {COLLECTION_COLUMNS if with_raw_json else COLLECTION_SUMMARY_COLUMNS} "
+                "FROM collections WHERE collection_id = ?",
+                (collection_id,)
+            )
+            row = cursor.fetchone()
         
         if row:
-            return {
+            collection = {
                 'collection_id': row[0],
                 'issuer': row[1],
                 'name': row[2],
                 'description': row[3],
                 'created_at_height': row[4],
                 'total_supply': row[5],
-                'raw_json': json.loads(row[6]),
-                'tx_hash': row[7],
-                'created_at': row[8]
+                'tx_hash': row[-2],
+                'created_at': row[-1]
             }
+            if with_raw_json:
+                collection['raw_json'] = _json_unpack(row[6])
+            return collection
         return None
         
+    def get_collection_ids(self) -> set:
+        """IDs of all collections (read from the primary-key index only)"""
+        with self.conn() as conn:
+            return {row[0] for row in conn.execute("SELECT collection_id FROM collections")}
+    
+    def collection_exists(self, collection_id: str) -> bool:
+        """Check existence with a primary-key probe (no row columns read)"""
+        with self.conn() as conn:
+            return conn.execute(SQL_COLLECTION_EXISTS, (collection_id,)).fetchone() is not None
+        
     def get_all_collections(self) -> List[Dict]:
         """Get all collections"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT collection_id, issuer, name, description, created_at_height, total_supply FROM collections ORDER BY created_at DESC"
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                "collection_id": row[0],
-                "issuer": row[1],
-                "name": row[2],
-                "description": row[3],
-                "created_at_height": row[4],
-                "total_supply": row[5],
-            }
-            for row in rows
-        ]
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT collection_id, issuer, name, description, created_at_height, "
+                f"{SQL_SUPPLY} FROM collections ORDER BY created_at DESC"
+            )
+            return [
+                {
+                    "collection_id": row[0],
+                    "issuer": row[1],
+                    "name": row[2],
+                    "description": row[3],
+                    "created_at_height": row[4],
+                    "total_supply": row[5],
+                }
+                for row in cursor
+            ]
     
     # ================== NFT Operations ==================
     
-    def get_nft(self, collection_id: str, nft_id: int) -> Optional[Dict]:
+    def get_nft(self, collection_id: str, nft_id: int) -> Optional[NFTRow]:
         """Get NFT info"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM nfts WHERE collection_id = ? AND nft_id = ?",
-            (collection_id, nft_id)
-        )
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'id': row[0],
-                'collection_id': row[1],
-                'nft_id': row[2],
-                'metadata_uri': row[3],
-                'extra': json.loads(row[4]) if row[4] else {},
-                'owner': row[5],
-                'status': row[6],
-                'created_at_height': row[7],
-                'tx_hash': row[8],
-                'created_at': row[9]
-            }
-        return None
-        
-    def get_nfts_by_collection(self, collection_id: str) -> List[Dict]:
-        """Get all NFTs in a collection"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM nfts WHERE collection_id = ? ORDER BY nft_id",
-            (collection_id,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        
-        nfts = []
-        for row in rows:
-            nfts.append({
-                'id': row[0],
-                'collection_id': row[1],
-                'nft_id': row[2],
-                'metadata_uri': row[3],
-                'extra': json.loads(row[4]) if row[4] else {},
-                'owner': row[5],
-                'status': row[6],
-                'created_at_height': row[7],
-                'tx_hash': row[8],
-                'created_at': row[9],
-            })
-        return nfts
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {NFT_COLUMNS} FROM nfts WHERE collection_id = ? AND nft_id = ?",
+                (collection_id, nft_id)
+            )
+            row = cursor.fetchone()
         
+        return NFTRow.from_row(row) if row else None
         
+    def get_nfts_by_collection(self, collection_id: str,
+                               limit: Optional[int] = None, offset: int = 0) -> List[NFTRow]:
+        """Get NFTs in a collection (all of them unless limit is given)"""
+        return list(self.iter_nfts_by_collection(collection_id, limit, offset))
+    
+    def iter_nfts_by_collection(self, collection_id: str,
+                                limit: Optional[int] = None, offset: int = 0) -> Iterator[NFTRow]:
+        """Yield NFTs in a collection straight off the cursor (no fetchall)"""
+        with self.conn() as conn:
+            cursor = conn.execute(
+                f"SELECT {NFT_COLUMNS} FROM nfts WHERE collection_id = ? ORDER BY nft_id LIMIT ? OFFSET ?",
+                (collection_id, _sql_limit(limit), offset)
+            )
+            try:
+                for row in cursor:
+                    yield NFTRow.from_row(row)
+            finally:
+                cursor.close()
+    
+    def count_nfts_by_collection(self, collection_id: str) -> int:
+        """Get number of NFTs in a collection"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM nfts WHERE collection_id = ?", (collection_id,))
+            return cursor.fetchone()[0]
+    
+    def _get_counter(self, key: str) -> int:
+        """Read a trigger-maintained row counter from indexer_state"""
+        with self.conn() as conn:
+            row = conn.execute(
+                "SELECT CAST(value AS INTEGER) FROM indexer_state WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else 0
+    
     def get_all_collections_count(self) -> int:
         """Get total number of collections"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM collections")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self._get_counter('collection_count')
 
     def get_total_nfts_count(self) -> int:
         """Get total number of NFTs"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM nfts")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self._get_counter('nft_count')
+    
+    def get_stats_bundle(self) -> Dict[str, int]:
+        """Get dashboard stats in a single query"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    (SELECT value FROM indexer_state WHERE key = 'last_height'),
+                    (SELECT COUNT(*) FROM listings WHERE status = 'active'),
+                    (SELECT CAST(value AS INTEGER) FROM indexer_state WHERE key = 'collection_count'),
+                    (SELECT CAST(value AS INTEGER) FROM indexer_state WHERE key = 'nft_count')
+            ''')
+            row = cursor.fetchone()
+        
+        return {
+            'last_indexed_height': int(row[0]) if row[0] else 0,
+            'total_listings': row[1],
+            'collections': row[2],
+            'total_nfts': row[3]
+        }
     
     def get_nft_owner(self, collection_id: str, nft_id: int) -> Optional[str]:
         """Get NFT owner"""
-        nft = self.get_nft(collection_id, nft_id)
-        return nft['owner'] if nft else None
+        with self.conn() as conn:
+            row = conn.execute(SQL_SELECT_OWNER, (collection_id, nft_id)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _owner_for_log(cursor: sqlite3.Cursor, collection_id: str, nft_id: int) -> Optional[str]:
+        """Current owner, looked up only to explain a rejected owner-conditional UPDATE"""
+        row = cursor.execute(SQL_SELECT_OWNER, (collection_id, nft_id)).fetchone()
+        return row[0] if row else None
     
     def transfer_nft(self, collection_id: str, nft_id: int, 
                      from_addr: str, to_addr: str, 
                      height: int, tx_hash: str = None,
                      tx_type: str = "transfer", price: int = None) -> bool:
         """Transfer NFT ownership"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        try:
-            # Verify current owner
-            current_owner = self.get_nft_owner(collection_id, nft_id)
-            if current_owner != from_addr:
-                print(f"❌ Transfer failed: {from_addr} is not the owner of NFT #{nft_id} (current: {current_owner})")
-                return False
-            
-            # Update owner
-            cursor.execute('''
-                UPDATE nfts SET owner = ?, status = 'active' 
-                WHERE collection_id = ? AND nft_id = ?
-            ''', (to_addr, collection_id, nft_id))
-            
-            # If there's a listing, cancel it
-            cursor.execute('''
-                UPDATE listings SET status = 'sold' 
-                WHERE collection_id = ? AND nft_id = ? AND status = 'active'
-            ''', (collection_id, nft_id))
-            
-            # Record transfer history
-            cursor.execute('''
-                INSERT INTO transfer_history
-                (collection_id, nft_id, from_address, to_address, tx_type, price, block_height, tx_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (collection_id, nft_id, from_addr, to_addr, tx_type, price, height, tx_hash))
-            
-            conn.commit()
-            print(f"✅ NFT transfer successful: {collection_id}#{nft_id} {from_addr[:20]}... -> {to_addr[:20]}...")
-            return True
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
             
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Transfer failed: {e}")
-            return False
-        finally:
-            conn.close()
+            try:
+                # Update owner, only if from_addr currently owns the NFT
+                cursor.execute(SQL_UPDATE_OWNER, (to_addr, collection_id, nft_id, from_addr))
+                if cursor.fetchone() is None:
+                    logger.warning("❌ Transfer failed: %s is not the owner of NFT #%s (current: %s)",
+                                   from_addr, nft_id, self._owner_for_log(cursor, collection_id, nft_id))
+                    return False
+                
+                # If there's a listing, cancel it
+                cursor.execute(SQL_CLOSE_LISTING, ('sold', collection_id, nft_id))
+                
+                # Record transfer history
+                cursor.execute(
+                    SQL_INSERT_HISTORY,
+                    (collection_id, nft_id, from_addr, to_addr, tx_type, price, height, tx_hash)
+                )
+                
+                self._commit(conn)
+                logger.debug("✅ NFT transfer successful: %s#%s %.20s... -> %.20s...", collection_id, nft_id, from_addr, to_addr)
+                return True
+                
+            except Exception as e:
+                self._rollback(conn)
+                logger.error("❌ Transfer failed: %s", e)
+                return False
     
     def mint_nft(self, collection_id: str, nft_id: int, to_addr: str,
                  metadata_uri: str, extra: Dict, height: int, 
                  issuer: str, tx_hash: str = None) -> bool:
         """Mint new NFT"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        try:
-            # Verify collection exists and issuer is correct
-            collection = self.get_collection(collection_id)
-            if not collection:
-                print(f"❌ Mint failed: Collection does not exist {collection_id}")
-                return False
-            
-            if collection['issuer'] != issuer:
-                print(f"❌ Mint failed: {issuer} is not the collection issuer")
-                return False
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
             
-            # Check if NFT ID already exists
-            if self.get_nft(collection_id, nft_id):
-                print(f"❌ Mint failed: NFT #{nft_id} already exists")
+            try:
+                # Insert NFT, only if the collection exists and issuer matches
+                cursor.execute(SQL_MINT_NFT, (
+                    collection_id, nft_id, metadata_uri, _json_dumps(extra), to_addr, height, tx_hash,
+                    collection_id, issuer
+                ))
+                
+                if cursor.rowcount == 0:
+                    # Nothing inserted; work out why only on this (rare) path
+                    cursor.execute(SQL_MINT_FAILURE_REASON, (collection_id, collection_id, nft_id))
+                    collection_issuer, nft_exists = cursor.fetchone()
+                    if collection_issuer is None:
+                        logger.warning("❌ Mint failed: Collection does not exist %s", collection_id)
+                    elif collection_issuer != issuer:
+                        logger.warning("❌ Mint failed: %s is not the collection issuer", issuer)
+                    elif nft_exists:
+                        logger.warning("❌ Mint failed: NFT #%s already exists", nft_id)
+                    return False
+                
+                # Record history
+                cursor.execute(
+                    SQL_INSERT_HISTORY,
+                    (collection_id, nft_id, "MINT", to_addr, "mint", None, height, tx_hash)
+                )
+                
+                self._commit(conn)
+                logger.debug("✅ NFT minted successfully: %s#%s -> %.20s...", collection_id, nft_id, to_addr)
+                return True
+                
+            except Exception as e:
+                self._rollback(conn)
+                logger.error("❌ Mint failed: %s", e)
                 return False
-            
-            # Insert NFT
-            cursor.execute('''
-                INSERT INTO nfts 
-                (collection_id, nft_id, metadata_uri, extra, owner, created_at_height, tx_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (collection_id, nft_id, metadata_uri, json.dumps(extra), to_addr, height, tx_hash))
-            
-            # Update total supply
-            cursor.execute('''
-                UPDATE collections SET total_supply = total_supply + 1 WHERE collection_id = ?
-            ''', (collection_id,))
-            
-            # Record history
-            cursor.execute('''
-                INSERT INTO transfer_history
-                (collection_id, nft_id, from_address, to_address, tx_type, block_height, tx_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (collection_id, nft_id, "MINT", to_addr, "mint", height, tx_hash))
-            
-            conn.commit()
-            print(f"✅ NFT minted successfully: {collection_id}#{nft_id} -> {to_addr[:20]}...")
-            return True
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Mint failed: {e}")
-            return False
-        finally:
-            conn.close()
     
     # ================== Listing Operations ==================
     
@@ -426,63 +875,110 @@ class NFTDatabase:
                        seller: str, price: int, height: int, 
                        tx_hash: str = None) -> bool:
         """Create listing"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        
-        try:
-            # Verify seller is the owner
-            current_owner = self.get_nft_owner(collection_id, nft_id)
-            if current_owner != seller:
-                print(f"❌ Listing failed: {seller} is not the owner of NFT #{nft_id}")
-                return False
-            
-            # Check if there's already an active listing
-            cursor.execute('''
-                SELECT id FROM listings 
-                WHERE collection_id = ? AND nft_id = ? AND status = 'active'
-            ''', (collection_id, nft_id))
-            if cursor.fetchone():
-                print(f"⚠️ NFT #{nft_id} already has an active listing, cancelling old listing")
-                cursor.execute('''
-                    UPDATE listings SET status = 'cancelled' 
-                    WHERE collection_id = ? AND nft_id = ? AND status = 'active'
-                ''', (collection_id, nft_id))
-            
-            # Create new listing
-            cursor.execute('''
-                INSERT INTO listings 
-                (collection_id, nft_id, seller, price, created_at_height, tx_hash)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (collection_id, nft_id, seller, price, height, tx_hash))
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
             
-            # Update NFT status
-            cursor.execute('''
-                UPDATE nfts SET status = 'listed' 
-                WHERE collection_id = ? AND nft_id = ?
-            ''', (collection_id, nft_id))
+            try:
+                # Mark the NFT listed, only if the seller owns it
+                cursor.execute(SQL_SET_NFT_STATUS, ('listed', collection_id, nft_id, seller))
+                if cursor.fetchone() is None:
+                    logger.warning("❌ Listing failed: %s is not the owner of NFT #%s (current: %s)",
+                                   seller, nft_id, self._owner_for_log(cursor, collection_id, nft_id))
+                    return False
+                
+                # Cancel any previous active listing
+                cursor.execute(SQL_CLOSE_LISTING, ('cancelled', collection_id, nft_id))
+                if cursor.rowcount > 0:
+                    logger.info("⚠️ NFT #%s already had an active listing, cancelled old listing", nft_id)
+                
+                # Create new listing
+                cursor.execute(SQL_INSERT_LISTING, (collection_id, nft_id, seller, price, height, tx_hash,
+                                                    collection_id, nft_id))
+                
+                self._commit(conn)
+                logger.debug("✅ Listing successful: %s#%s @ %s utia", collection_id, nft_id, price)
+                return True
+                
+            except Exception as e:
+                self._rollback(conn)
+                logger.error("❌ Listing failed: %s", e)
+                return False
+    
+    def cancel_listing(self, collection_id: str, nft_id: int, seller: str,
+                       height: int, tx_hash: str = None) -> bool:
+        """Cancel the seller's active listing"""
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
             
-            conn.commit()
-            print(f"✅ Listing successful: {collection_id}#{nft_id} @ {price} utia")
-            return True
+            try:
+                # Back to unlisted, only if the seller still owns the NFT
+                cursor.execute(SQL_SET_NFT_STATUS, ('active', collection_id, nft_id, seller))
+                if cursor.fetchone() is None:
+                    logger.warning("❌ Cancel listing failed: %s is not the owner of NFT #%s (current: %s)",
+                                   seller, nft_id, self._owner_for_log(cursor, collection_id, nft_id))
+                    return False
+                
+                cursor.execute(SQL_CLOSE_LISTING, ('cancelled', collection_id, nft_id))
+                if cursor.rowcount == 0:
+                    self._rollback(conn)
+                    logger.warning("❌ Cancel listing failed: NFT %s#%s has no active listing", collection_id, nft_id)
+                    return False
+                
+                self._commit(conn)
+                logger.debug("✅ Listing cancelled: %s#%s", collection_id, nft_id)
+                return True
+                
+            except Exception as e:
+                self._rollback(conn)
+                logger.error("❌ Cancel listing failed: %s", e)
+                return False
+    
+    def buy_nft(self, collection_id: str, nft_id: int, buyer: str,
+                height: int, tx_hash: str = None) -> bool:
+        """Settle a purchase of the active listing (no separate listing read)"""
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
             
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Listing failed: {e}")
-            return False
-        finally:
-            conn.close()
+            try:
+                # Close the listing and learn seller/price in the same statement
+                cursor.execute(SQL_SELL_LISTING, (collection_id, nft_id))
+                row = cursor.fetchone()
+                if row is None:
+                    logger.warning("❌ Buy failed: NFT %s#%s has no active listing", collection_id, nft_id)
+                    return False
+                seller, price = row
+                
+                cursor.execute(SQL_UPDATE_OWNER, (buyer, collection_id, nft_id, seller))
+                if cursor.fetchone() is None:
+                    self._rollback(conn)
+                    logger.warning("❌ Buy failed: seller %s no longer owns NFT #%s (current: %s)",
+                                   seller, nft_id, self._owner_for_log(cursor, collection_id, nft_id))
+                    return False
+                
+                cursor.execute(
+                    SQL_INSERT_HISTORY,
+                    (collection_id, nft_id, seller, buyer, "sale", price, height, tx_hash)
+                )
+                
+                self._commit(conn)
+                logger.debug("✅ NFT sold: %s#%s @ %s utia -> %.20s...", collection_id, nft_id, price, buyer)
+                return True
+                
+            except Exception as e:
+                self._rollback(conn)
+                logger.error("❌ Buy failed: %s", e)
+                return False
     
     def get_active_listing(self, collection_id: str, nft_id: int) -> Optional[Dict]:
         """Get active listing"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM listings 
-            WHERE collection_id = ? AND nft_id = ? AND status = 'active'
-            ORDER BY created_at DESC LIMIT 1
-        ''', (collection_id, nft_id))
-        row = cursor.fetchone()
-        conn.close()
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {LISTING_COLUMNS} FROM listings
+                WHERE collection_id = ? AND nft_id = ? AND status = 'active'
+                ORDER BY created_at DESC LIMIT 1
+            ''', (collection_id, nft_id))
+            row = cursor.fetchone()
         
         if row:
             return {
@@ -500,89 +996,196 @@ class NFTDatabase:
     
     # ================== Query Methods ==================
     
-    def get_nfts_by_owner(self, owner: str) -> List[Dict]:
-        """Get all NFTs owned by an address"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM nfts WHERE owner = ?", (owner,))
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [{
-            'collection_id': row[1],
-            'nft_id': row[2],
-            'metadata_uri': row[3],
-            'extra': json.loads(row[4]) if row[4] else {},
-            'owner': row[5],
-            'status': row[6]
-        } for row in rows]
-    
-    def get_all_listings(self) -> List[Dict]:
-        """Get all active listings"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT l.*, n.metadata_uri 
-            FROM listings l
-            JOIN nfts n ON l.collection_id = n.collection_id AND l.nft_id = n.nft_id
-            WHERE l.status = 'active'
-            ORDER BY l.created_at DESC
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [{
-            'collection_id': row[1],
-            'nft_id': row[2],
-            'seller': row[3],
-            'price': row[4],
-            'metadata_uri': row[9]
-        } for row in rows]
+    def get_nfts_by_owner(self, owner: str,
+                          limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Get NFTs owned by an address (all of them unless limit is given)"""
+        return list(self.iter_nfts_by_owner(owner, limit, offset))
+    
+    def iter_nfts_by_owner(self, owner: str,
+                           limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict]:
+        """Yield NFTs owned by an address straight off the cursor (no fetchall)"""
+        with self.conn() as conn:
+            cursor = conn.execute(
+                "SELECT collection_id, nft_id, metadata_uri, extra, owner, status "
+                "FROM nfts WHERE owner = ? ORDER BY id LIMIT ? OFFSET ?",
+                (owner, _sql_limit(limit), offset)
+            )
+            try:
+                for row in cursor:
+                    yield {
+                        'collection_id': row[0],
+                        'nft_id': row[1],
+                        'metadata_uri': row[2],
+                        'extra': orjson.loads(row[3]) if row[3] else {},
+                        'owner': row[4],
+                        'status': row[5]
+                    }
+            finally:
+                cursor.close()
+    
+    def count_nfts_by_owner(self, owner: str) -> int:
+        """Get number of NFTs owned by an address"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM nfts WHERE owner = ?", (owner,))
+            return cursor.fetchone()[0]
+    
+    def get_all_listings(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Get active listings (all of them unless limit is given)"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT collection_id, nft_id, seller, price, metadata_uri
+                FROM listings
+                WHERE status = 'active'
+                ORDER BY created_at DESC
+                LIMIT ? OFFSET ?
+            ''', (_sql_limit(limit), offset))
+            return [{
+                'collection_id': row[0],
+                'nft_id': row[1],
+                'seller': row[2],
+                'price': row[3],
+                'metadata_uri': row[4]
+            } for row in cursor]
+    
+    def count_active_listings(self) -> int:
+        """Get number of active listings"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM listings WHERE status = 'active'")
+            return cursor.fetchone()[0]
+    
+    def get_transfer_history(self, collection_id: str, nft_id: int,
+                             limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Get transfer history of an NFT (all of it unless limit is given)"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT from_address, to_address, tx_type, price, block_height, tx_hash, created_at
+                FROM transfer_history
+                WHERE collection_id = ? AND nft_id = ?
+                ORDER BY block_height, id
+                LIMIT ? OFFSET ?
+            ''', (collection_id, nft_id, _sql_limit(limit), offset))
+            return [{
+                'from_address': row[0],
+                'to_address': row[1],
+                'tx_type': row[2],
+                'price': row[3],
+                'block_height': row[4],
+                'tx_hash': row[5],
+                'created_at': row[6]
+            } for row in cursor]
+    
+    def count_transfer_history(self, collection_id: str, nft_id: int) -> int:
+        """Get number of history records of an NFT"""
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM transfer_history WHERE collection_id = ? AND nft_id = ?",
+                (collection_id, nft_id)
+            )
+            return cursor.fetchone()[0]
     
     # ================== Indexer State ==================
     
     def get_last_indexed_height(self) -> int:
         """Get last indexed block height"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM indexer_state WHERE key = 'last_height'")
-        row = cursor.fetchone()
-        conn.close()
+        with self.conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM indexer_state WHERE key = 'last_height'")
+            row = cursor.fetchone()
         return int(row[0]) if row else 0
     
     def set_last_indexed_height(self, height: int):
         """Set last indexed block height"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO indexer_state (key, value, updated_at)
-            VALUES ('last_height', ?, CURRENT_TIMESTAMP)
-        ''', (str(height),))
-        conn.commit()
-        conn.close()
+        with self.write_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_state (key, value, updated_at)
+                VALUES ('last_height', ?, CURRENT_TIMESTAMP)
+            ''', (str(height),))
+            self._commit(conn)
+    
+    def get_imported_files(self) -> Dict[str, Tuple[int, int]]:
+        """Data files imported so far: path -> (size, mtime_ns)"""
+        with self.conn() as conn:
+            return {row[0]: (row[1], row[2])
+                    for row in conn.execute("SELECT path, size, mtime_ns FROM imported_files")}
+    
+    def mark_file_imported(self, path: str, size: int, mtime_ns: int, tx_hash: str = ''):
+        """Record an imported data file (inside bulk_apply: same transaction as its data)"""
+        with self.write_conn() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO imported_files (path, size, mtime_ns, tx_hash) VALUES (?, ?, ?, ?)
+            ''', (path, size, mtime_ns, tx_hash or None))
+            self._commit(conn)
+    
+    def _processed_set(self) -> set:
+        """In-memory set of processed tx hashes (loaded from the DB once)"""
+        if self._processed is None:
+            with self.conn() as conn:
+                self._processed = {row[0] for row in conn.execute("SELECT tx_hash FROM processed_txs")}
+        return self._processed
     
     def is_tx_processed(self, tx_hash: str) -> bool:
         """Check if transaction has been processed"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT tx_hash FROM processed_txs WHERE tx_hash = ?", (tx_hash,))
-        result = cursor.fetchone() is not None
-        conn.close()
-        return result
+        with self._processed_lock:
+            return tx_hash in self._processed_set()
     
     def mark_tx_processed(self, tx_hash: str, height: int):
-        """Mark transaction as processed"""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO processed_txs (tx_hash, block_height) VALUES (?, ?)
-        ''', (tx_hash, height))
-        conn.commit()
-        conn.close()
+        """Mark transaction as processed (buffered, see flush_processed)"""
+        with self._processed_lock:
+            self._processed_set().add(tx_hash)
+            self._pending_txs.append((tx_hash, height))
+            if len(self._pending_txs) < PROCESSED_FLUSH_SIZE:
+                return
+        self.flush_processed()
+    
+    def prune_processed_txs(self, keep_from_height: int, vacuum_pages: int = 100) -> int:
+        """
+        Forget processed txs below `keep_from_height` so the table (and the
+        in-memory set) stays small, then release up to `vacuum_pages` free pages.
+        Txs of files in imported_files are kept: if such a file changes it is
+        imported again, and its ops must not be replayed
+        """
+        self.flush_processed()
+        with self.write_conn() as conn:
+            pruned = [row[0] for row in conn.execute('''
+                DELETE FROM processed_txs
+                WHERE block_height < ?
+                  AND tx_hash NOT IN (SELECT tx_hash FROM imported_files WHERE tx_hash IS NOT NULL)
+                RETURNING tx_hash
+            ''', (keep_from_height,))]
+            self._commit(conn)
+            # sqlite3 steps the pragma once per execute, freeing one page each time
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            for _ in range(min(free_pages, vacuum_pages)):
+                conn.execute("PRAGMA incremental_vacuum(1)")
+        with self._processed_lock:
+            if self._processed is not None:
+                self._processed.difference_update(pruned)
+        if pruned:
+            logger.info("🧹 Pruned %d processed txs below height %d", len(pruned), keep_from_height)
+        return len(pruned)
+    
+    def flush_processed(self):
+        """Write buffered processed-tx marks in one transaction"""
+        with self._processed_lock:
+            pending, self._pending_txs = self._pending_txs, []
+        if not pending:
+            return
+        with self.write_conn() as conn:
+            conn.executemany('''
+                INSERT OR IGNORE INTO processed_txs (tx_hash, block_height) VALUES (?, ?)
+            ''', pending)
+            self._commit(conn)
 
 
 # Test
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     db = NFTDatabase()
     
     # Test create collection
@@ -1,39 +1,58 @@
 # indexer/import_from_deploy.py
 
-import json
+import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import NFTDatabase
+import orjson
 
+# Repo root first, so `indexer` is the package even when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indexer.database import NFTDatabase
 
-def import_collection(deploy_file: str):
-    """Import collection from deploy file into the database"""
-    db = NFTDatabase()
-    
+logger = logging.getLogger(__name__)
+
+
+# Deploy files read/parsed ahead of the (single) database writer
+LOAD_WORKERS = 4
+
+
+def load_deploy_file(deploy_file: str) -> Optional[dict]:
+    """Read and parse a deploy file (None if it does not exist)"""
     if not os.path.exists(deploy_file):
-        print(f"❌ File does not exist: {deploy_file}")
-        return False
+        logger.error("❌ File does not exist: %s", deploy_file)
+        return None
     
-    with open(deploy_file, 'r') as f:
-        deploy_info = json.load(f)
+    # Parse the raw bytes with orjson (no text decode, C parser)
+    with open(deploy_file, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def import_collection(deploy_file: str, db: NFTDatabase = None):
+    """Import collection from deploy file into the database"""
+    return import_deploy_info(load_deploy_file(deploy_file), db)
+
+
+def import_deploy_info(deploy_info: Optional[dict], db: NFTDatabase = None):
+    """Import an already parsed deploy file into the database"""
+    if deploy_info is None:
+        return False
+    if db is None:
+        db = NFTDatabase()
     
     collection_data = deploy_info['collection_data']
     result = deploy_info['result']
     height = result.get('height', 1)
     txhash = result.get('txhash', '')
     
-    print(f"📦 Importing collection: {collection_data['collection_id']}")
-    print(f"  Height: {height}")
-    print(f"  TxHash: {txhash}")
+    logger.debug("📦 Importing collection: %s (height %s, tx %s)",
+                 collection_data['collection_id'], height, txhash)
     
     success = db.create_collection(collection_data, height, txhash)
-    
-    if success:
-        print("✅ Import succeeded!")
-    else:
-        print("⚠️ Import failed (might already exist)")
+    if not success:
+        logger.warning("⚠️ Import failed (might already exist): %s", collection_data['collection_id'])
     
     return success
 
@@ -42,7 +61,9 @@ def main():
     data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
     
     # Find all deploy_*.json files
-    deploy_files = [f for f in os.listdir(data_dir) if f.startswith('deploy_') and f.endswith('.json')]
+    with os.scandir(data_dir) as entries:
+        deploy_files = [e.name for e in entries
+                        if e.name.startswith('deploy_') and e.name.endswith('.json') and e.is_file()]
     
     if not deploy_files:
         print("No deployment files found")
@@ -50,11 +71,29 @@ def main():
     
     print(f"Found {len(deploy_files)} deployment files\n")
     
-    for filename in deploy_files:
-        filepath = os.path.join(data_dir, filename)
-        import_collection(filepath)
-        print()
+    # deploy_collection.py names files deploy_{collection_id}.json, so
+    # collections already in the database can be skipped without parsing
+    db = NFTDatabase()
+    existing = db.get_collection_ids()
+    paths = [
+        os.path.join(data_dir, filename) for filename in deploy_files
+        if filename[len('deploy_'):-len('.json')] not in existing
+    ]
+    skipped = len(deploy_files) - len(paths)
+    if skipped:
+        print(f"Skipping {skipped} already imported collections")
+    
+    # Worker threads read and parse the files; this thread is the only writer
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+        imported = sum(
+            bool(import_deploy_info(deploy_info, db))
+            for deploy_info in pool.map(load_deploy_file, paths)
+        )
+    db.close()
+    
+    print(f"✅ Imported {imported}/{len(paths)} collections")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     main()
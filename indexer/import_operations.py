@@ -1,11 +1,17 @@
 # indexer/import_operations.py
 
-import json
+import functools
+import logging
 import os
 import sys
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import NFTDatabase
+import orjson
+
+# Repo root first, so `indexer` is the package even when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indexer.database import NFTDatabase
+
+logger = logging.getLogger(__name__)
 
 
 def import_test_flow_results():
@@ -17,113 +23,105 @@ def import_test_flow_results():
     results_file = os.path.join(data_dir, 'test_flow_results.json')
     
     if not os.path.exists(results_file):
-        print(f"❌ File does not exist: {results_file}")
+        logger.error("❌ File does not exist: %s", results_file)
         return
     
-    with open(results_file, 'r') as f:
-        data = json.load(f)
+    with open(results_file, 'rb') as f:
+        data = orjson.loads(f.read())
     
     results = data.get('results', [])
-    print(f"Found {len(results)} operation records\n")
+    logger.info("Found %d operation records", len(results))
     
-    for op_type, result in results:
-        if not result:
-            continue
-            
-        blob_data = result.get('data', {})
-        height = result.get('height', 0)
-        tx_hash = result.get('txhash', '')
-        
-        print(f"Processing: {op_type} @ height {height}")
-        print(f"  Data: {blob_data}")
-        
-        process_operation(db, blob_data, height, tx_hash)
-        print()
-
-
-def process_operation(db: NFTDatabase, data: dict, height: int, tx_hash: str):
-    """Process a single operation"""
-    data_type = data.get('type', '')
+    # All operations share one transaction (one commit), each in its own savepoint
+    applied = db.bulk_apply(
+        functools.partial(process_result, db, op_type, result)
+        for op_type, result in results
+        if result
+    )
+    logger.info("✅ Applied %d/%d operations", sum(applied), len(applied))
+
+
+def process_result(db: NFTDatabase, op_type: str, result: dict) -> bool:
+    """Process one [op_type, result] record from test_flow_results.json"""
+    blob_data = result.get('data', {})
+    height = result.get('height', 0)
+    tx_hash = result.get('txhash', '')
     
-    if data_type == 'nft_mint':
-        collection_id = data.get('collection_id')
-        nft_id = data.get('nft_id')
-        to_addr = data.get('to')
-        issuer = data.get('issuer')
-        metadata_uri = data.get('metadata_uri', '')
-        extra = data.get('extra', {})
-        
-        success = db.mint_nft(
-            collection_id=collection_id,
-            nft_id=nft_id,
-            to_addr=to_addr,
-            metadata_uri=metadata_uri,
-            extra=extra,
-            height=height,
-            issuer=issuer,
-            tx_hash=tx_hash
-        )
-        print(f"  Mint result: {'✅' if success else '❌'}")
-        
-    elif data_type == 'nft_transfer':
-        collection_id = data.get('collection_id')
-        nft_id = data.get('nft_id')
-        from_addr = data.get('from')
-        to_addr = data.get('to')
-        
-        success = db.transfer_nft(
-            collection_id=collection_id,
-            nft_id=nft_id,
-            from_addr=from_addr,
-            to_addr=to_addr,
-            height=height,
-            tx_hash=tx_hash,
-            tx_type="transfer"
-        )
-        print(f"  Transfer result: {'✅' if success else '❌'}")
-        
-    elif data_type == 'nft_list':
-        collection_id = data.get('collection_id')
-        nft_id = data.get('nft_id')
-        seller = data.get('seller')
-        price = data.get('price')
-        
-        success = db.create_listing(
-            collection_id=collection_id,
-            nft_id=nft_id,
-            seller=seller,
-            price=price,
-            height=height,
-            tx_hash=tx_hash
-        )
-        print(f"  List result: {'✅' if success else '❌'}")
-        
-    elif data_type == 'nft_buy':
-        collection_id = data.get('collection_id')
-        nft_id = data.get('nft_id')
-        buyer = data.get('buyer')
-        
-        # Get listing
-        listing = db.get_active_listing(collection_id, nft_id)
-        if listing:
-            success = db.transfer_nft(
-                collection_id=collection_id,
-                nft_id=nft_id,
-                from_addr=listing['seller'],
-                to_addr=buyer,
-                height=height,
-                tx_hash=tx_hash,
-                tx_type="sale",
-                price=listing['price']
-            )
-            print(f"  Buy result: {'✅' if success else '❌'}")
-        else:
-            print(f"  Buy failed: No active listing found")
-    else:
-        print(f"  Skipping unknown type: {data_type}")
+    logger.debug("Processing: %s @ height %s", op_type, height)
+    logger.debug("  Data: %s", blob_data)
+    
+    success = process_operation(db, blob_data, height, tx_hash)
+    logger.debug("  %s result: %s", op_type, '✅' if success else '❌')
+    return success
+
+
+def _do_mint(db: NFTDatabase, data: dict, height: int, tx_hash: str) -> bool:
+    return db.mint_nft(
+        collection_id=data.get('collection_id'),
+        nft_id=data.get('nft_id'),
+        to_addr=data.get('to'),
+        metadata_uri=data.get('metadata_uri', ''),
+        extra=data.get('extra', {}),
+        height=height,
+        issuer=data.get('issuer'),
+        tx_hash=tx_hash
+    )
+
+
+def _do_transfer(db: NFTDatabase, data: dict, height: int, tx_hash: str) -> bool:
+    return db.transfer_nft(
+        collection_id=data.get('collection_id'),
+        nft_id=data.get('nft_id'),
+        from_addr=data.get('from'),
+        to_addr=data.get('to'),
+        height=height,
+        tx_hash=tx_hash,
+        tx_type="transfer"
+    )
+
+
+def _do_list(db: NFTDatabase, data: dict, height: int, tx_hash: str) -> bool:
+    return db.create_listing(
+        collection_id=data.get('collection_id'),
+        nft_id=data.get('nft_id'),
+        seller=data.get('seller'),
+        price=data.get('price'),
+        height=height,
+        tx_hash=tx_hash
+    )
+
+
+def _do_buy(db: NFTDatabase, data: dict, height: int, tx_hash: str) -> bool:
+    return db.buy_nft(
+        collection_id=data.get('collection_id'),
+        nft_id=data.get('nft_id'),
+        buyer=data.get('buyer'),
+        height=height,
+        tx_hash=tx_hash
+    )
+
+
+# Operation type -> handler
+_HANDLERS = {
+    'nft_mint': _do_mint,
+    'nft_transfer': _do_transfer,
+    'nft_list': _do_list,
+    'nft_buy': _do_buy,
+}
+
+
+def process_operation(db: NFTDatabase, data: dict, height: int, tx_hash: str) -> bool:
+    """Process a single operation, return whether it was applied"""
+    data_type = data.get('type', '')
+    handler = _HANDLERS.get(data_type)
+    if handler is None:
+        logger.warning("  Skipping unknown type: %s", data_type)
+        return False
+    return handler(db, data, height, tx_hash)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     print("="*50)
     print("Importing test flow results")
     print("="*50 + "\n")
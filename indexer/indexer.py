@@ -1,30 +1,62 @@
 # indexer/indexer.py
 
-import time
-import json
+import functools
 import sys
 import os
 import logging
-from typing import Dict, List, Optional
+import queue
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import orjson
 
-from database import NFTDatabase
+# Repo root first: run as a script, this file's directory is on sys.path
+# and `indexer` would otherwise resolve to this module instead of the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexer.database import NFTDatabase
 from scripts.docker_blob_client import DockerBlobClient
+from config.config import PROCESSED_TX_RETENTION
 
 # Set up logging
 os.makedirs(os.path.join(os.path.dirname(__file__), '..', 'logs'), exist_ok=True)
 
+# Records are formatted on the calling thread and written to the file/console
+# by a background QueueListener, so indexing never blocks on log I/O
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler(os.path.join(os.path.dirname(__file__), '..', 'logs', 'indexer.log')),
+    logging.StreamHandler()
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(os.path.dirname(__file__), '..', 'logs', 'indexer.log')),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
+# Threads reading/parsing data files, and how many files they may run ahead
+LOAD_WORKERS = 8
+LOAD_AHEAD = 32
+
+
+def _prefetch(pool: ThreadPoolExecutor, fn, items: Iterable, ahead: int) -> Iterator:
+    """Like pool.map(fn, items), but keeps at most `ahead` results in flight"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 
 class NFTIndexer:
     """NFT Indexer - Rebuild state from on-chain events"""
@@ -33,40 +65,39 @@ class NFTIndexer:
         self.db = NFTDatabase()
         self.client = DockerBlobClient()
         self.running = False
+        self.max_height = 0  # highest block height seen so far
+        # Blob type -> handler
+        self._dispatch = {
+            'collection_definition': self._handle_collection_definition,
+            'nft_mint': self._handle_mint,
+            'nft_transfer': self._handle_transfer,
+            'nft_list': self._handle_list,
+            'nft_cancel_list': self._handle_cancel_list,
+            'nft_buy': self._handle_buy,
+        }
     
     def process_blob(self, data: Dict, height: int, tx_hash: str = None) -> bool:
         """Process a single Blob data"""
         try:
             data_type = data.get('type', '')
-            
-            if data_type == 'collection_definition':
-                return self._handle_collection_definition(data, height, tx_hash)
-            elif data_type == 'nft_mint':
-                return self._handle_mint(data, height, tx_hash)
-            elif data_type == 'nft_transfer':
-                return self._handle_transfer(data, height, tx_hash)
-            elif data_type == 'nft_list':
-                return self._handle_list(data, height, tx_hash)
-            elif data_type == 'nft_cancel_list':
-                return self._handle_cancel_list(data, height, tx_hash)
-            elif data_type == 'nft_buy':
-                return self._handle_buy(data, height, tx_hash)
-            else:
-                logger.debug(f"Skipping unknown type: {data_type}")
+            handler = self._dispatch.get(data_type)
+            if handler is None:
+                logger.debug("Skipping unknown type: %s", data_type)
                 return False
+            return handler(data, height, tx_hash)
                 
         except Exception as e:
-            logger.error(f"Failed to process Blob: {e}")
+            logger.error("Failed to process Blob: %s", e)
             return False
     
     def _handle_collection_definition(self, data: Dict, height: int, tx_hash: str) -> bool:
-       """Handle collection definition"""
-        logger.info(f"📦 Found collection definition: {data.get('collection_id')}")
+        """Handle collection definition"""
+        logger.info("📦 Found collection definition: %s", data.get('collection_id'))
         
         required_fields = ['collection_id', 'issuer', 'name']
         for field in required_fields:
             if field not in data:
-                logger.error(f"Collection definition missing field: {field}")
+                logger.error("Collection definition missing field: %s", field)
                 return False
         
         data['created_at_height'] = height
@@ -74,7 +105,7 @@ class NFTIndexer:
     
     def _handle_mint(self, data: Dict, height: int, tx_hash: str) -> bool:
         """Handle mint operation"""
-        logger.info(f"🎨 Found mint: {data.get('collection_id')}#{data.get('nft_id')}")
+        logger.info("🎨 Found mint: %s#%s", data.get('collection_id'), data.get('nft_id'))
         
         collection_id = data.get('collection_id')
         nft_id = data.get('nft_id')
@@ -98,7 +129,7 @@ class NFTIndexer:
     
     def _handle_transfer(self, data: Dict, height: int, tx_hash: str) -> bool:
         """Handle transfer operation"""
-        logger.info(f"🔄 Found transfer: {data.get('collection_id')}#{data.get('nft_id')}")
+        logger.info("🔄 Found transfer: %s#%s", data.get('collection_id'), data.get('nft_id'))
         
         collection_id = data.get('collection_id')
         nft_id = data.get('nft_id')
@@ -121,7 +152,7 @@ class NFTIndexer:
     
     def _handle_list(self, data: Dict, height: int, tx_hash: str) -> bool:
         """Handle listing operation"""
-        logger.info(f"💰 Found listing: {data.get('collection_id')}#{data.get('nft_id')}")
+        logger.info("💰 Found listing: %s#%s", data.get('collection_id'), data.get('nft_id'))
         
         collection_id = data.get('collection_id')
         nft_id = data.get('nft_id')
@@ -143,7 +174,7 @@ class NFTIndexer:
     
     def _handle_cancel_list(self, data: Dict, height: int, tx_hash: str) -> bool:
         """Handle cancel listing"""
-        logger.info(f"❌ Found cancel listing: {data.get('collection_id')}#{data.get('nft_id')}")
+        logger.info("❌ Found cancel listing: %s#%s", data.get('collection_id'), data.get('nft_id'))
         
         collection_id = data.get('collection_id')
         nft_id = data.get('nft_id')
@@ -163,7 +194,7 @@ class NFTIndexer:
     
     def _handle_buy(self, data: Dict, height: int, tx_hash: str) -> bool:
         """Handle buy operation"""
-        logger.info(f"🛒 Found purchase: {data.get('collection_id')}#{data.get('nft_id')}")
+        logger.info("🛒 Found purchase: %s#%s", data.get('collection_id'), data.get('nft_id'))
         
         collection_id = data.get('collection_id')
         nft_id = data.get('nft_id')
@@ -173,63 +204,119 @@ class NFTIndexer:
             logger.error("Buy operation missing required fields")
             return False
         
-        # Get current listing
-        listing = self.db.get_active_listing(collection_id, nft_id)
-        if not listing:
-            logger.error(f"NFT {collection_id}#{nft_id} has no active listing")
-            return False
-        
-        # Execute transfer (from seller to buyer)
-        return self.db.transfer_nft(
+        # Close the active listing and transfer from seller to buyer
+        return self.db.buy_nft(
             collection_id=collection_id,
             nft_id=nft_id,
-            from_addr=listing['seller'],
-            to_addr=buyer,
+            buyer=buyer,
             height=height,
-            tx_hash=tx_hash,
-            tx_type="sale",
-            price=listing['price']
+            tx_hash=tx_hash
         )
     
-    def import_from_file(self, filepath: str) -> bool:
-        """Import data from local JSON file"""
+    @staticmethod
+    def load_file(filepath: str) -> Optional[Tuple[Dict, int, str]]:
+        """Read and parse a local JSON file into (blob_data, height, tx_hash)"""
         try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            with open(filepath, 'rb') as f:
+                data = orjson.loads(f.read())
             
             # Support two formats: direct blob data, or deployment file containing collection_data
             if 'collection_data' in data:
-                blob_data = data['collection_data']
                 result = data.get('result', {})
-                height = result.get('height', 1)
-                tx_hash = result.get('txhash', '')
-            else:
-                blob_data = data
-                height = data.get('height', 1)
-                tx_hash = data.get('txhash', '')
+                return data['collection_data'], result.get('height', 1), result.get('txhash', '')
+            return data, data.get('height', 1), data.get('txhash', '')
             
-            return self.process_blob(blob_data, height, tx_hash)
+        except Exception as e:
+            logger.error("Failed to read file %s: %s", filepath, e)
+            return None
+    
+    def import_from_file(self, filepath: str) -> bool:
+        """Import data from local JSON file"""
+        return self.import_loaded(filepath, self.load_file(filepath))
+    
+    def import_loaded(self, filepath: str, loaded: Optional[Tuple[Dict, int, str]]) -> bool:
+        """Apply a file parsed by load_file"""
+        if loaded is None:
+            return False
+        blob_data, height, tx_hash = loaded
+        try:
+            if tx_hash and self.db.is_tx_processed(tx_hash):
+                logger.info("Skipping already processed tx: %s", tx_hash)
+                return True
+            
+            success = self.process_blob(blob_data, height, tx_hash)
+            if success and tx_hash:
+                self.db.mark_tx_processed(tx_hash, height)
+            self.max_height = max(self.max_height, height)
+            return success
             
         except Exception as e:
-            logger.error(f"Failed to import file {filepath}: {e}")
+            logger.error("Failed to import file %s: %s", filepath, e)
             return False
     
+    def _skip_reason(self, blob_data: Dict) -> Optional[str]:
+        """Why a data file can never apply (so it need not be read again), or None"""
+        data_type = blob_data.get('type', '')
+        if data_type not in self._dispatch:
+            return f"not an NFT blob (type {data_type!r})"
+        if (data_type == 'collection_definition'
+                and self.db.collection_exists(blob_data.get('collection_id'))):
+            return "collection already exists"
+        return None
+    
     def import_all_from_data_dir(self):
         """Import all JSON files from data directory"""
         data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
         
         if not os.path.exists(data_dir):
-            logger.warning(f"Data directory does not exist: {data_dir}")
+            logger.warning("Data directory does not exist: %s", data_dir)
             return
         
-        json_files = sorted([f for f in os.listdir(data_dir) if f.endswith('.json')])
+        with os.scandir(data_dir) as it:
+            entries = sorted((e for e in it if e.name.endswith('.json') and e.is_file()),
+                             key=lambda e: e.name)
+        
+        logger.info("Found %d JSON files", len(entries))
         
-        logger.info(f"Found {len(json_files)} JSON files")
+        # Skip files imported before and unchanged since (same size and mtime)
+        imported = self.db.get_imported_files()
+        stats = {e.name: e.stat() for e in entries}
+        entries = [e for e in entries
+                   if imported.get(e.name) != (stats[e.name].st_size, stats[e.name].st_mtime_ns)]
+        if len(entries) < len(stats):
+            logger.info("Skipping %d unchanged files", len(stats) - len(entries))
+        
+        def import_file(filename: str, loaded) -> bool:
+            # Files that can never apply are recorded too, so later runs skip them
+            reason = loaded and self._skip_reason(loaded[0])
+            if reason:
+                logger.info("Skipping %s: %s", filename, reason)
+                success = True
+            else:
+                logger.info("Importing: %s", filename)
+                success = self.import_loaded(filename, loaded)
+            if success:
+                st = stats[filename]
+                self.db.mark_file_imported(filename, st.st_size, st.st_mtime_ns, loaded[2])
+            return success
+        
+        with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+            # Files are read and parsed on the pool, a bounded window ahead of
+            # the writes, which stay serial on this thread
+            loaded = _prefetch(pool, self.load_file, (e.path for e in entries), LOAD_AHEAD)
+            
+            # One transaction for the whole import instead of one per operation;
+            # on the initial sync (empty DB) also skip index maintenance until the end
+            operations = (functools.partial(import_file, e.name, l) for e, l in zip(entries, loaded))
+            if self.db.get_total_nfts_count() == 0:
+                with self.db.with_bulk_load():
+                    self.db.bulk_apply(operations)
+            else:
+                self.db.bulk_apply(operations)
         
-        for filename in json_files:
-            filepath = os.path.join(data_dir, filename)
-            logger.info(f"Importing: {filename}")
-            self.import_from_file(filepath)
+        # Old tx hashes can no longer be replayed, stop tracking them
+        if self.max_height > PROCESSED_TX_RETENTION:
+            self.db.prune_processed_txs(self.max_height - PROCESSED_TX_RETENTION)
 
 
 def main():
@@ -242,7 +329,7 @@ def main():
     
     indexer = NFTIndexer()
     
-   # Import all data from local files
+    # Import all data from local files
     indexer.import_all_from_data_dir()
     
     print("\n✅ Indexing complete!")
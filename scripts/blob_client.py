@@ -2,19 +2,50 @@
 Celestia Blob Submission Client
 """
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import base64
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import hashlib
+import re
 import time
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import (
     NODE_API_URL, NODE_RPC_URL, AUTH_TOKEN, 
-    NAMESPACE_ID, GAS_LIMIT, GAS_FEE
+    NAMESPACE_BYTES, GAS_LIMIT, GAS_FEE
 )
 
+# Matches the "type" of blobs the indexer understands; anything else on the
+# namespace is skipped before it is JSON-parsed. A search, not a prefix test:
+# "type" is not always the first key (submit_collection appends it)
+NFT_BLOB_TYPE = re.compile(rb'"type"\s*:\s*"(?:nft_|collection_definition")')
+
+
+# Error message of blob.GetAll for a height without blobs on the namespace
+BLOB_NOT_FOUND = "blob: not found"
+
+
+# Serialized '{"jsonrpc":"2.0","id":1,"method":...,"params":' per method
+_RPC_PREFIXES = {}
+
+
+def _rpc_call(method: str, params: list) -> bytes:
+    """JSON-RPC request body; only the params are serialized per call"""
+    prefix = _RPC_PREFIXES.get(method)
+    if prefix is None:
+        prefix = _RPC_PREFIXES[method] = orjson.dumps(
+            {"jsonrpc": "2.0", "id": 1, "method": method}
+        )[:-1] + b',"params":'
+    return prefix + orjson.dumps(params) + b'}'
+
+
+# header.LocalHead takes no params: the whole body is constant
+RPC_LOCAL_HEAD = _rpc_call("header.LocalHead", [])
+
 
 class CelestiaBlobClient:
     """Celestia Blob Operations Client"""
@@ -23,20 +54,32 @@ class CelestiaBlobClient:
                  gateway_url: str = NODE_API_URL,
                  rpc_url: str = NODE_RPC_URL,
                  auth_token: str = AUTH_TOKEN,
-                 namespace_id: str = NAMESPACE_ID):
+                 namespace: bytes = NAMESPACE_BYTES):
         self.gateway_url = gateway_url.rstrip('/')
         self.rpc_url = rpc_url.rstrip('/')
         self.auth_token = auth_token
-        self.namespace_id = namespace_id
+        self.namespace_id = namespace.hex()
+        self.namespace_b64 = base64.b64encode(namespace).decode()
         self.headers = {
             "Authorization": f"Bearer {auth_token}",
             "Content-Type": "application/json"
         }
+        
+        # Keep-alive session: every JSON-RPC call reuses a pooled connection.
+        # Request bodies are pre-serialized with orjson (data=...), the
+        # Content-Type header comes from self.headers.
+        # Retries only cover failed connects (urllib3 does not retry POST
+        # otherwise), so a blob is never submitted twice.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                              max_retries=Retry(total=3, backoff_factor=0.2))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
-    def _namespace_to_base64(self) -> str:
-        """Convert hex namespace to base64"""
-        ns_bytes = bytes.fromhex(self.namespace_id)
-        return base64.b64encode(ns_bytes).decode()
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
     
     def submit_blob(self, data: Dict[str, Any]) -> Optional[Dict]:
         """
@@ -49,41 +92,34 @@ class CelestiaBlobClient:
             Submission result or None
         """
         try:
-            # 1. Convert data to JSON string, then to base64
-            json_str = json.dumps(data, separators=(',', ':'))
-            data_base64 = base64.b64encode(json_str.encode()).decode()
+            # 1. Convert data to compact JSON bytes, then to base64
+            json_bytes = orjson.dumps(data)
             
-            # 2. Construct JSON-RPC request
+            # 2. Construct JSON-RPC request params
             # Use blob.Submit method
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "blob.Submit",
-                "params": [
-                    [
-                        {
-                            "namespace": self._namespace_to_base64(),
-                            "data": data_base64,
-                            "share_version": 0,
-                            "commitment": ""  # Will be calculated automatically
-                        }
-                    ],
+            params = [
+                [
                     {
-                        "gas_limit": GAS_LIMIT,
-                        "fee": GAS_FEE
+                        "namespace": self.namespace_b64,
+                        "data": base64.b64encode(json_bytes).decode('ascii'),
+                        "share_version": 0,
+                        "commitment": ""  # Will be calculated automatically
                     }
-                ]
-            }
+                ],
+                {
+                    "gas_limit": GAS_LIMIT,
+                    "fee": GAS_FEE
+                }
+            ]
             
             print(f"📤 Submitting Blob...")
             print(f"   Namespace: {self.namespace_id}")
-            print(f"   Data size: {len(json_str)} bytes")
+            print(f"   Data size: {len(json_bytes)} bytes")
             
             # 3. Send request to RPC
-            response = requests.post(
+            response = self.session.post(
                 self.rpc_url,
-                json=payload,
-                headers=self.headers,
+                data=_rpc_call("blob.Submit", params),
                 timeout=30
             )
             
@@ -100,7 +136,7 @@ class CelestiaBlobClient:
                 "height": height,
                 "namespace": self.namespace_id,
                 "data": data,
-                "data_hash": hashlib.sha256(json_str.encode()).hexdigest()
+                "data_hash": hashlib.sha256(json_bytes).hexdigest()
             }
             
         except requests.exceptions.RequestException as e:
@@ -112,31 +148,36 @@ class CelestiaBlobClient:
             traceback.print_exc()
             return None
     
-    def get_blobs_at_height(self, height: int) -> list:
+    def submit_blobs_parallel(self, items: List[Dict[str, Any]],
+                              max_workers: int = 8) -> List[Optional[Dict]]:
+        """
+        Submit Blobs as separate transactions, overlapping their round-trips
+        
+        Args:
+            items: Data to submit, one Blob (and one transaction) each
+            max_workers: Concurrent submissions (the session pool holds 16)
+        
+        Returns:
+            Submission result or None per item, in input order
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.submit_blob, items))
+    
+    def get_blobs_at_height(self, height: int, nft_only: bool = True) -> list:
         """
         Get all Blobs at specified height
         
         Args:
             height: Block height
+            nft_only: Skip blobs that are not NFT operations / collections
         
         Returns:
             List of Blobs
         """
         try:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "blob.GetAll",
-                "params": [
-                    height,
-                    [self._namespace_to_base64()]
-                ]
-            }
-            
-            response = requests.post(
+            response = self.session.post(
                 self.rpc_url,
-                json=payload,
-                headers=self.headers,
+                data=_rpc_call("blob.GetAll", [height, [self.namespace_b64]]),
                 timeout=30
             )
             
@@ -146,43 +187,105 @@ class CelestiaBlobClient:
                 # Possibly no blob at this height
                 return []
             
-            blobs = result.get('result', [])
-            parsed_blobs = []
-            
-            for blob in blobs or []:
-                try:
-                    # Decode base64 data
-                    data_bytes = base64.b64decode(blob.get('data', ''))
-                    data_json = json.loads(data_bytes.decode())
-                    parsed_blobs.append({
-                        "namespace": blob.get('namespace'),
-                        "data": data_json,
-                        "commitment": blob.get('commitment'),
-                        "share_version": blob.get('share_version')
-                    })
-                except:
-                    continue
-            
-            return parsed_blobs
+            return self._parse_blobs(result.get('result', []), nft_only)
             
         except Exception as e:
             print(f"❌ Failed to get Blob: {e}")
             return []
     
+    def get_blobs_at_heights(self, heights: List[int],
+                             nft_only: bool = True) -> Optional[Dict[int, list]]:
+        """
+        Get all Blobs at several heights with one JSON-RPC batch request
+        
+        Args:
+            heights: Block heights
+            nft_only: Skip blobs that are not NFT operations / collections
+        
+        Returns:
+            Height -> list of Blobs (empty for heights without Blobs).
+            Heights whose request failed are left out so the caller can
+            retry them; None if the batch request itself failed
+        """
+        if not heights:
+            return {}
+        payload = [
+            {
+                "jsonrpc": "2.0",
+                "id": i,
+                "method": "blob.GetAll",
+                "params": [
+                    height,
+                    [self.namespace_b64]
+                ]
+            }
+            for i, height in enumerate(heights)
+        ]
+        
+        try:
+            response = self.session.post(
+                self.rpc_url,
+                data=orjson.dumps(payload),
+                timeout=30 + len(heights)
+            )
+            response.raise_for_status()
+            results = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"❌ Failed to get Blobs: {e}")
+            return None
+        
+        if not isinstance(results, list):
+            print(f"❌ Unexpected batch response: {str(results)[:200]}")
+            return None
+        
+        # Batch responses may come back in any order, match them by id
+        blobs_by_height = {}
+        for result in results:
+            index = result.get('id') if isinstance(result, dict) else None
+            if not isinstance(index, int) or not 0 <= index < len(heights):
+                print(f"❌ Unexpected batch entry: {str(result)[:200]}")
+                continue
+            height = heights[index]
+            if "error" in result:
+                # The node reports a height without blobs as "blob: not found"
+                if BLOB_NOT_FOUND in str(result['error']):
+                    blobs_by_height[height] = []
+                else:
+                    print(f"❌ Failed to get Blobs at height {height}: {result['error']}")
+                continue
+            blobs_by_height[height] = self._parse_blobs(result.get('result'), nft_only)
+        
+        return blobs_by_height
+    
+    @staticmethod
+    def _parse_blobs(blobs: Optional[list], nft_only: bool = True) -> list:
+        """Decode the base64 JSON payload of blob.GetAll results"""
+        parsed_blobs = []
+        
+        for blob in blobs or []:
+            try:
+                # Decode base64 data
+                data_bytes = base64.b64decode(blob.get('data', ''))
+                if nft_only and NFT_BLOB_TYPE.search(data_bytes) is None:
+                    continue
+                data_json = orjson.loads(data_bytes)
+                parsed_blobs.append({
+                    "namespace": blob.get('namespace'),
+                    "data": data_json,
+                    "commitment": blob.get('commitment'),
+                    "share_version": blob.get('share_version')
+                })
+            except:
+                continue
+        
+        return parsed_blobs
+    
     def get_current_height(self) -> int:
         """Get current block height"""
         try:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "header.LocalHead",
-                "params": []
-            }
-            
-            response = requests.post(
+            response = self.session.post(
                 self.rpc_url,
-                json=payload,
-                headers=self.headers,
+                data=RPC_LOCAL_HEAD,
                 timeout=10
             )
             
@@ -198,9 +301,20 @@ class CelestiaBlobClient:
 
 # ============ Simplified Operation Functions ============
 
+_client: Optional[CelestiaBlobClient] = None
+
+
+def _get_client() -> CelestiaBlobClient:
+    """Shared client, so repeated submissions reuse its connection pool"""
+    global _client
+    if _client is None:
+        _client = CelestiaBlobClient()
+    return _client
+
+
 def submit_collection(collection_data: Dict) -> Optional[Dict]:
     """Submit NFT collection definition"""
-    client = CelestiaBlobClient()
+    client = _get_client()
     
     # Ensure data format is correct
     if 'type' not in collection_data:
@@ -211,7 +325,7 @@ def submit_collection(collection_data: Dict) -> Optional[Dict]:
 
 def submit_operation(operation: str, collection_id: str, **kwargs) -> Optional[Dict]:
     """Submit NFT operation (mint/transfer/list/buy)"""
-    client = CelestiaBlobClient()
+    client = _get_client()
     
     data = {
         "type": f"nft_{operation}",
@@ -244,6 +358,6 @@ if __name__ == "__main__":
         
         # Wait a few seconds then query
         time.sleep(3)
-        blobs = client.get_blobs_at_height(result['height'])
+        blobs = client.get_blobs_at_height(result['height'], nft_only=False)
 
         print(f"📥 Blobs at this height: {blobs}")
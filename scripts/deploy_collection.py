@@ -1,27 +1,19 @@
 # scripts/deploy_collection.py
 
-import json
 import os
 import sys
 import time
-import subprocess
+
+import orjson
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scripts.docker_blob_client import submit_collection
-
-
-def get_alice_address():
-    """Get the address of 'alice' inside the container"""
-    result = subprocess.run(
-        'docker exec celestia-validator celestia-appd keys show alice -a --keyring-backend test',
-        shell=True, capture_output=True, text=True
-    )
-    return result.stdout.strip()
+from config.config import get_address
 
 
 def main():
     collection_id = "celestia_dragons_v1"
-    alice_address = get_alice_address()
+    alice_address = get_address('alice')
     
     print(f"Alice address: {alice_address}")
     
@@ -76,8 +68,11 @@ def main():
         }
         
         output_file = os.path.join(output_dir, f'deploy_{collection_id}.json')
-        with open(output_file, 'w') as f:
-            json.dump(deploy_info, f, indent=2)
+        # Write to a temp file and rename, so the indexer never reads a partial file
+        tmp_file = output_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(deploy_info, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, output_file)
             
         print(f"  Saved to: {output_file}")
         return result
@@ -1,109 +1,143 @@
 # scripts/docker_blob_client.py
 
-import subprocess
-import json
 import time
 import hashlib
+import shlex
 import sys
 import os
+from typing import List, Optional
+
+import orjson
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.docker_shell import DockerShell
+from config.config import NAMESPACE_ID, CONTAINER_NAME, get_address
 
-NAMESPACE_ID = "0000004e46545a4f4e45"
-CONTAINER_NAME = "celestia-validator"
+# Confirmation polling: each poll is a round-trip on the persistent docker
+# shell session (no process spawn), so polling often is cheap
+TX_POLL_INTERVAL = 0.5
+TX_WAIT_TIMEOUT = 20
 
 
 class DockerBlobClient:
     def __init__(self, container: str = CONTAINER_NAME):
         self.container = container
         
-    def _docker_exec(self, cmd: str, timeout: int = 30) -> str:
-        """Execute command inside container"""
-        full_cmd = f'docker exec {self.container} sh -c "{cmd}"'
-        result = subprocess.run(
-            full_cmd, 
-            shell=True, 
-            capture_output=True, 
-            text=True,
-            timeout=timeout
-        )
+    def _docker_exec(self, argv: List[str], timeout: int = 30) -> str:
+        """Execute command inside container (via the persistent shell session)"""
+        # Arguments are quoted, never interpolated into shell syntax
+        result = DockerShell.get(self.container).run(shlex.join(argv), timeout=timeout)
         if result.returncode != 0:
             raise RuntimeError(f"Docker exec failed: {result.stderr}")
         return result.stdout.strip()
     
     def submit_blob(self, data: dict, from_account: str = "alice") -> dict:
-        """Submit JSON data as Blob"""
+        """Submit JSON data as Blob and wait until it is on-chain"""
+        pending = self.broadcast_blob(data, from_account=from_account)
+        if pending is None:
+            return None
+        return self.await_confirmation(pending)
+    
+    def broadcast_blob(self, data: dict, from_account: str = "alice",
+                       sequence: Optional[int] = None) -> dict:
+        """
+        Submit JSON data as Blob without waiting for inclusion; pass the
+        result to await_confirmation() later (so many submits can go out
+        before any of them is confirmed)
+        
+        Several txs from one account can only be in flight together if each
+        gets its own `sequence` (see get_account_sequence); otherwise the CLI
+        reads it from committed state and the second tx is rejected.
+        """
         try:
             # 1. Convert JSON to hex
-            json_str = json.dumps(data, separators=(',', ':'))
-            hex_data = json_str.encode().hex()
+            json_bytes = orjson.dumps(data)
+            hex_data = json_bytes.hex()
             
             print(f"📤 Submitting Blob...")
             print(f"  From: {from_account}")
-            print(f"  Size: {len(json_str)} bytes")
+            print(f"  Size: {len(json_bytes)} bytes")
             
             # 2. Execute pay-for-blob inside container
-            cmd = f'''celestia-appd tx blob pay-for-blob \\
-                {NAMESPACE_ID} \\
-                {hex_data} \\
-                --from {from_account} \\
-                --keyring-backend test \\
-                --fees 2000utia \\
-                --yes \\
-                --output json'''
-            
-            output = self._docker_exec(cmd)
+            argv = [
+                'celestia-appd', 'tx', 'blob', 'pay-for-blob',
+                NAMESPACE_ID,
+                hex_data,
+                '--from', from_account,
+                '--keyring-backend', 'test',
+                '--fees', '2000utia',
+                '--yes',
+                '--output', 'json'
+            ]
+            if sequence is not None:
+                argv += ['--sequence', str(sequence)]
+            output = self._docker_exec(argv)
             
             # 3. Parse output to get txhash
-            tx_result = json.loads(output)
+            tx_result = orjson.loads(output)
             txhash = tx_result.get('txhash', '')
             
             if not txhash:
                 print("❌ Failed to get txhash")
                 return None
+            if tx_result.get('code', 0) != 0:
+                # Rejected by CheckTx (e.g. sequence mismatch), never enters a block
+                print(f"❌ Transaction rejected: {tx_result.get('raw_log', '')}")
+                return None
             
             print(f"⏳ TxHash: {txhash}")
+            return {
+                'txhash': txhash,
+                'namespace': NAMESPACE_ID,
+                'data': data,
+                'data_hash': hashlib.sha256(json_bytes).hexdigest()
+            }
+            
+        except Exception as e:
+            print(f"❌ Submission failed: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def await_confirmation(self, pending: dict) -> dict:
+        """Wait for a broadcast_blob() result to be included, return it with its height"""
+        txhash = pending['txhash']
+        try:
             print(f"⏳ Waiting for transaction confirmation...")
             
             # 4. Wait for transaction confirmation (with retry mechanism)
-            height = self._wait_for_tx(txhash, max_retries=10, interval=2)
+            height = self._wait_for_tx(txhash)
             
             if height:
                 print(f"✅ Blob on-chain, height: {height}")
-                return {
-                    'txhash': txhash,
-                    'height': height,
-                    'namespace': NAMESPACE_ID,
-                    'data': data,
-                    'data_hash': hashlib.sha256(json_str.encode()).hexdigest()
-                }
+                return {**pending, 'height': height}
             else:
                 # Even if query fails, transaction may have succeeded, return estimated result
                 current_height = self.get_current_height()
                 print(f"⚠️ Unable to confirm transaction status, but transaction may have succeeded")
                 print(f"  Current height: {current_height}")
                 return {
-                    'txhash': txhash,
+                    **pending,
                     'height': current_height,  # Estimated
-                    'namespace': NAMESPACE_ID,
-                    'data': data,
-                    'data_hash': hashlib.sha256(json_str.encode()).hexdigest(),
                     'confirmed': False
                 }
             
         except Exception as e:
-            print(f"❌ Submission failed: {e}")
+            print(f"❌ Confirmation failed: {e}")
             import traceback
             traceback.print_exc()
             return None
     
-    def _wait_for_tx(self, txhash: str, max_retries: int = 10, interval: int = 2) -> int:
+    def _wait_for_tx(self, txhash: str, timeout: float = TX_WAIT_TIMEOUT,
+                     interval: float = TX_POLL_INTERVAL) -> int:
         """Wait for transaction to be included, return block height"""
+        max_retries = max(1, int(timeout / interval))
         for i in range(max_retries):
             try:
-                query_cmd = f"celestia-appd query tx {txhash} --output json"
-                tx_info_str = self._docker_exec(query_cmd)
-                tx_info = json.loads(tx_info_str)
+                tx_info_str = self._docker_exec(
+                    ['celestia-appd', 'query', 'tx', txhash, '--output', 'json']
+                )
+                tx_info = orjson.loads(tx_info_str)
                 
                 if tx_info.get('code', 0) == 0 and tx_info.get('height'):
                     return int(tx_info['height'])
@@ -123,11 +157,24 @@ class DockerBlobClient:
         
         return 0
     
+    def get_account_sequence(self, account: str) -> int:
+        """Next sequence number of a keyring account (committed state)"""
+        output = self._docker_exec([
+            'celestia-appd', 'query', 'auth', 'account', get_address(account), '--output', 'json'
+        ])
+        info = orjson.loads(output)
+        account_info = info.get('account', info)
+        account_info = account_info.get('value', account_info)
+        # Vesting accounts nest the base account
+        account_info = account_info.get('base_vesting_account', account_info)
+        account_info = account_info.get('base_account', account_info)
+        return int(account_info.get('sequence', 0))
+    
     def get_current_height(self) -> int:
         """Get current chain height"""
         try:
-            status = self._docker_exec("celestia-appd status --output json")
-            status_json = json.loads(status)
+            status = self._docker_exec(['celestia-appd', 'status', '--output', 'json'])
+            status_json = orjson.loads(status)
             return int(status_json['sync_info']['latest_block_height'])
         except:
             return 0
@@ -135,17 +182,27 @@ class DockerBlobClient:
     def query_tx(self, txhash: str) -> dict:
         """Query transaction details"""
         try:
-            cmd = f"celestia-appd query tx {txhash} --output json"
-            output = self._docker_exec(cmd)
-            return json.loads(output)
+            output = self._docker_exec(['celestia-appd', 'query', 'tx', txhash, '--output', 'json'])
+            return orjson.loads(output)
         except Exception as e:
             print(f"Failed to query transaction: {e}")
             return {}
 
 
+_client = None
+
+
+def _get_client() -> DockerBlobClient:
+    """Shared client for the module-level helpers"""
+    global _client
+    if _client is None:
+        _client = DockerBlobClient()
+    return _client
+
+
 def submit_collection(collection_data: dict):
     """Submit NFT collection"""
-    client = DockerBlobClient()
+    client = _get_client()
     if 'type' not in collection_data:
         collection_data['type'] = 'collection_definition'
     return client.submit_blob(collection_data, from_account='alice')
@@ -153,7 +210,7 @@ def submit_collection(collection_data: dict):
 
 def submit_operation(op: str, collection_id: str, **kwargs):
     """Submit NFT operation"""
-    client = DockerBlobClient()
+    client = _get_client()
     data = {
         'type': f'nft_{op}',
         'collection_id': collection_id,
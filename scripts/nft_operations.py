@@ -1,32 +1,18 @@
 # scripts/nft_operations.py
 
-import json
+import logging
 import time
 import sys
 import os
-import subprocess
+from typing import List, Optional
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from docker_blob_client import DockerBlobClient, NAMESPACE_ID
-
-
-def get_address(key_name: str) -> str:
-    """Get account address inside container"""
-    result = subprocess.run(
-        f'docker exec celestia-validator celestia-appd keys show {key_name} -a --keyring-backend test',
-        shell=True, capture_output=True, text=True
-    )
-    return result.stdout.strip()
+import orjson
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.docker_blob_client import _get_client
+from config.config import get_address, get_addresses
 
-# Get addresses
-ALICE_ADDRESS = get_address('alice')
-BOB_ADDRESS = get_address('bob')
-VALIDATOR_ADDRESS = get_address('validator')
-
-print(f"Alice: {ALICE_ADDRESS}")
-print(f"Bob: {BOB_ADDRESS}")
-
+logger = logging.getLogger(__name__)
 
 def mint_nft(collection_id: str, nft_id: int, to_address: str, 
              metadata_uri: str = "", extra: dict = None, 
@@ -35,9 +21,17 @@ def mint_nft(collection_id: str, nft_id: int, to_address: str,
     Mint new NFT
     Only the collection issuer can mint
     """
-    client = DockerBlobClient()
+    data = _mint_data(collection_id, nft_id, to_address, metadata_uri, extra, from_account)
     
-    data = {
+    logger.info("🎨 Minting NFT: %s#%s", collection_id, nft_id)
+    logger.info("  To: %.20s...", to_address)
+    
+    return _get_client().submit_blob(data, from_account=from_account)
+
+
+def _mint_data(collection_id: str, nft_id: int, to_address: str,
+               metadata_uri: str, extra: Optional[dict], from_account: str) -> dict:
+    return {
         "type": "nft_mint",
         "collection_id": collection_id,
         "nft_id": nft_id,
@@ -47,11 +41,37 @@ def mint_nft(collection_id: str, nft_id: int, to_address: str,
         "extra": extra or {},
         "timestamp": int(time.time())
     }
+
+
+def mint_many(collection_id: str, items: List[dict],
+              from_account: str = "alice") -> List[Optional[dict]]:
+    """
+    Mint many NFTs (e.g. an airdrop) without waiting for each one's block
     
-    print(f"\n🎨 Minting NFT: {collection_id}#{nft_id}")
-    print(f"  To: {to_address[:20]}...")
+    items: mint_nft keyword arguments per NFT (nft_id, to_address,
+    metadata_uri, extra). All mints are broadcast back to back with
+    consecutive account sequences, then confirmed one after another (they
+    usually land in the same few blocks, so later waits return at once).
+    Returns the submit result (or None) per item.
+    """
+    client = _get_client()
+    sequence = client.get_account_sequence(from_account)
+    pending = []
+    for item in items:
+        data = _mint_data(collection_id, item['nft_id'], item['to_address'],
+                          item.get('metadata_uri', ''), item.get('extra'), from_account)
+        logger.info("🎨 Minting NFT: %s#%s", collection_id, item['nft_id'])
+        result = client.broadcast_blob(data, from_account=from_account, sequence=sequence)
+        if result is None:
+            # Later txs would leave a sequence gap and be rejected too
+            break
+        pending.append(result)
+        sequence += 1
     
-    return client.submit_blob(data, from_account=from_account)
+    # Sequential on purpose: every call goes through the one DockerShell,
+    # which serializes commands anyway
+    results = [client.await_confirmation(result) for result in pending]
+    return results + [None] * (len(items) - len(results))
 
 
 def transfer_nft(collection_id: str, nft_id: int, 
@@ -61,8 +81,6 @@ def transfer_nft(collection_id: str, nft_id: int,
     Transfer NFT
     Only the current owner can transfer
     """
-    client = DockerBlobClient()
-    
     data = {
         "type": "nft_transfer",
         "collection_id": collection_id,
@@ -72,11 +90,11 @@ def transfer_nft(collection_id: str, nft_id: int,
         "timestamp": int(time.time())
     }
     
-    print(f"\n🔄 Transferring NFT: {collection_id}#{nft_id}")
-    print(f"  From: {from_address[:20]}...")
-    print(f"  To: {to_address[:20]}...")
+    logger.info("🔄 Transferring NFT: %s#%s", collection_id, nft_id)
+    logger.info("  From: %.20s...", from_address)
+    logger.info("  To: %.20s...", to_address)
     
-    return client.submit_blob(data, from_account=from_account)
+    return _get_client().submit_blob(data, from_account=from_account)
 
 
 def list_nft(collection_id: str, nft_id: int, 
@@ -86,8 +104,6 @@ def list_nft(collection_id: str, nft_id: int,
     List NFT for sale
     Price unit: utia (1 TIA = 1,000,000 utia)
     """
-    client = DockerBlobClient()
-    
     data = {
         "type": "nft_list",
         "collection_id": collection_id,
@@ -97,18 +113,16 @@ def list_nft(collection_id: str, nft_id: int,
         "timestamp": int(time.time())
     }
     
-    print(f"\n💰 Listing NFT: {collection_id}#{nft_id}")
-    print(f"  Seller: {seller_address[:20]}...")
-    print(f"  Price: {price_utia} utia ({price_utia / 1_000_000} TIA)")
+    logger.info("💰 Listing NFT: %s#%s", collection_id, nft_id)
+    logger.info("  Seller: %.20s...", seller_address)
+    logger.info("  Price: %s utia (%s TIA)", price_utia, price_utia / 1_000_000)
     
-    return client.submit_blob(data, from_account=from_account)
+    return _get_client().submit_blob(data, from_account=from_account)
 
 
 def cancel_listing(collection_id: str, nft_id: int,
                    seller_address: str, from_account: str = "alice"):
     """Cancel listing"""
-    client = DockerBlobClient()
-    
     data = {
         "type": "nft_cancel_list",
         "collection_id": collection_id,
@@ -117,9 +131,9 @@ def cancel_listing(collection_id: str, nft_id: int,
         "timestamp": int(time.time())
     }
     
-    print(f"\n❌ Cancelling listing: {collection_id}#{nft_id}")
+    logger.info("❌ Cancelling listing: %s#%s", collection_id, nft_id)
     
-    return client.submit_blob(data, from_account=from_account)
+    return _get_client().submit_blob(data, from_account=from_account)
 
 
 def buy_nft(collection_id: str, nft_id: int,
@@ -131,21 +145,20 @@ def buy_nft(collection_id: str, nft_id: int,
     In a real scenario, the buyer needs to first send a transfer to the seller,
     then pass the transfer tx_hash as payment_tx_hash
     """
-    client = DockerBlobClient()
-    
+    now = int(time.time())
     data = {
         "type": "nft_buy",
         "collection_id": collection_id,
         "nft_id": nft_id,
         "buyer": buyer_address,
-        "payment_tx_hash": payment_tx_hash or f"PAYMENT_{int(time.time())}",
-        "timestamp": int(time.time())
+        "payment_tx_hash": payment_tx_hash or f"PAYMENT_{now}",
+        "timestamp": now
     }
     
-    print(f"\n🛒 Buying NFT: {collection_id}#{nft_id}")
-    print(f"  Buyer: {buyer_address[:20]}...")
+    logger.info("🛒 Buying NFT: %s#%s", collection_id, nft_id)
+    logger.info("  Buyer: %.20s...", buyer_address)
     
-    return client.submit_blob(data, from_account=from_account)
+    return _get_client().submit_blob(data, from_account=from_account)
 
 
 # ============ Test Full Flow ============
@@ -154,6 +167,15 @@ def test_full_flow():
     """Test complete NFT lifecycle"""
     collection_id = "celestia_dragons_v1"
     
+    # Resolved here (one round-trip), not at import, so other actions don't pay for it
+    addresses = get_addresses('alice', 'bob', 'validator')
+    alice_address = addresses['alice']
+    bob_address = addresses['bob']
+    validator_address = addresses['validator']
+    
+    print(f"Alice: {alice_address}")
+    print(f"Bob: {bob_address}")
+    
     print("\n" + "="*60)
     print("🧪 Starting complete NFT flow test")
     print("="*60)
@@ -165,7 +187,7 @@ def test_full_flow():
     result = mint_nft(
         collection_id=collection_id,
         nft_id=4,
-        to_address=ALICE_ADDRESS,
+        to_address=alice_address,
         metadata_uri="ipfs://QmShadowDragon",
         extra={"name": "Shadow Dragon", "rarity": "mythic", "power": 99},
         from_account="alice"
@@ -179,7 +201,7 @@ def test_full_flow():
     result = list_nft(
         collection_id=collection_id,
         nft_id=1,
-        seller_address=ALICE_ADDRESS,
+        seller_address=alice_address,
         price_utia=5_000_000,  # 5 TIA
         from_account="alice"
     )
@@ -192,7 +214,7 @@ def test_full_flow():
     result = buy_nft(
         collection_id=collection_id,
         nft_id=1,
-        buyer_address=BOB_ADDRESS,
+        buyer_address=bob_address,
         from_account="bob"
     )
     if result:
@@ -204,8 +226,8 @@ def test_full_flow():
     result = transfer_nft(
         collection_id=collection_id,
         nft_id=1,
-        from_address=BOB_ADDRESS,
-        to_address=VALIDATOR_ADDRESS,
+        from_address=bob_address,
+        to_address=validator_address,
         from_account="bob"
     )
     if result:
@@ -220,11 +242,14 @@ def test_full_flow():
     output_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
     os.makedirs(output_dir, exist_ok=True)
     
-    with open(os.path.join(output_dir, 'test_flow_results.json'), 'w') as f:
-        json.dump({
+    output_file = os.path.join(output_dir, 'test_flow_results.json')
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(orjson.dumps({
             'results': [(op, r) for op, r in results],
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        }, f, indent=2, default=str)
+        }, option=orjson.OPT_INDENT_2, default=str))
+    os.replace(tmp_file, output_file)
     
     print(f"\nResults saved to: data/test_flow_results.json")
     
@@ -242,11 +267,35 @@ if __name__ == "__main__":
     parser.add_argument('--nft-id', '-n', type=int, help='NFT ID')
     parser.add_argument('--to', help='Recipient address')
     parser.add_argument('--price', type=int, help='Price (utia)')
+    parser.add_argument('--account', default='alice', help='Signing account (key name)')
     
     args = parser.parse_args()
     
-    if args.action == 'test':
-        test_full_flow()
-    else:
-        print(f"Executing {args.action} operation...")
-        # Execute corresponding operation based on arguments
+    # Action -> (required options, handler)
+    actions = {
+        'mint': (['nft_id'], lambda: mint_nft(
+            args.collection, args.nft_id, args.to or get_address(args.account),
+            from_account=args.account)),
+        'transfer': (['nft_id', 'to'], lambda: transfer_nft(
+            args.collection, args.nft_id, get_address(args.account), args.to,
+            from_account=args.account)),
+        'list': (['nft_id', 'price'], lambda: list_nft(
+            args.collection, args.nft_id, get_address(args.account), args.price,
+            from_account=args.account)),
+        'buy': (['nft_id'], lambda: buy_nft(
+            args.collection, args.nft_id, get_address(args.account),
+            from_account=args.account)),
+        'cancel': (['nft_id'], lambda: cancel_listing(
+            args.collection, args.nft_id, get_address(args.account),
+            from_account=args.account)),
+        'test': ([], test_full_flow),
+    }
+    required, handler = actions[args.action]
+    missing = [name for name in required if getattr(args, name) is None]
+    if missing:
+        parser.error(f"{args.action} requires " + ', '.join('--' + m.replace('_', '-') for m in missing))
+    
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
+    print(f"Executing {args.action} operation...")
+    handler()
@@ -0,0 +1,103 @@
+"""
+Tests for the pre-serialized JSON-RPC bodies in scripts/blob_client.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import base64
+
+import orjson
+import pytest
+import requests
+
+from scripts.blob_client import RPC_LOCAL_HEAD, CelestiaBlobClient, _rpc_call
+
+
+@pytest.mark.parametrize("method, params", [
+    ("header.LocalHead", []),
+    ("blob.GetAll", [42, ["AAAAAE5GVFpPTkU="]]),
+    ("blob.Submit", [[{"namespace": "AAAAAE5GVFpPTkU=", "data": "e30=",
+                       "share_version": 0, "commitment": ""}],
+                     {"gas_limit": 200000, "fee": 2000}]),
+])
+def test_rpc_call_round_trips(method, params):
+    expected = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    # Twice: the first call builds the cached prefix, the second reuses it
+    assert orjson.loads(_rpc_call(method, params)) == expected
+    assert orjson.loads(_rpc_call(method, params)) == expected
+
+
+def test_local_head_body():
+    assert orjson.loads(RPC_LOCAL_HEAD) == {
+        "jsonrpc": "2.0", "id": 1, "method": "header.LocalHead", "params": []
+    }
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+def _blob(data: dict) -> dict:
+    return {"namespace": "AAAAAE5GVFpPTkU=", "commitment": "c", "share_version": 0,
+            "data": base64.b64encode(orjson.dumps(data)).decode()}
+
+
+def _client_returning(monkeypatch, response):
+    client = CelestiaBlobClient()
+
+    def fake_post(url, data=None, timeout=None):
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(client.session, 'post', fake_post)
+    return client
+
+
+def test_get_blobs_at_heights_maps_results_by_id(monkeypatch):
+    mint = {"type": "nft_mint", "collection_id": "COL", "nft_id": 1}
+    client = _client_returning(monkeypatch, FakeResponse([
+        {"jsonrpc": "2.0", "id": 2, "result": [_blob(mint), _blob({"type": "test"})]},
+        {"jsonrpc": "2.0", "id": 0, "result": None},
+        {"jsonrpc": "2.0", "id": 1, "error": {"code": 1, "message": "blob: not found"}},
+    ]))
+
+    blobs = client.get_blobs_at_heights([10, 11, 12])
+
+    assert blobs[10] == [] and blobs[11] == []
+    assert [b["data"] for b in blobs[12]] == [mint]
+
+
+def test_get_blobs_at_heights_leaves_out_failed_heights(monkeypatch):
+    client = _client_returning(monkeypatch, FakeResponse([
+        {"jsonrpc": "2.0", "id": 0, "result": []},
+        {"jsonrpc": "2.0", "id": 1, "error": {"code": 1, "message": "header: syncing"}},
+        {"jsonrpc": "2.0", "id": 7, "result": []},
+    ]))
+
+    # Height 11 failed and height 12 got no usable answer: both can be retried
+    assert client.get_blobs_at_heights([10, 11, 12]) == {10: []}
+
+
+@pytest.mark.parametrize("response", [
+    requests.exceptions.ConnectionError("refused"),
+    FakeResponse({"error": "bad request"}, status_code=500),
+    FakeResponse(ValueError("not JSON")),
+    FakeResponse({"jsonrpc": "2.0", "id": 0, "result": []}),
+])
+def test_get_blobs_at_heights_batch_failure(monkeypatch, response):
+    client = _client_returning(monkeypatch, response)
+
+    assert client.get_blobs_at_heights([10, 11]) is None
@@ -0,0 +1,37 @@
+"""
+Tests for indexer/database.py on an in-memory database
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from indexer.database import NFTDatabase
+
+
+COLLECTION = {
+    "type": "collection_definition",
+    "collection_id": "test_collection_001",
+    "issuer": "celestia1testissuer",
+    "name": "Test NFT Collection",
+    "description": "A test collection",
+    "nfts": [
+        {"id": 1, "metadata_uri": "ipfs://test1", "extra": {}},
+        {"id": 2, "metadata_uri": "ipfs://test2", "extra": {"rarity": "rare"}}
+    ]
+}
+
+
+@pytest.mark.parametrize("db_path", [":memory:", ""])
+def test_in_memory_db_reads_back_writes(db_path):
+    db = NFTDatabase(db_path)
+
+    assert db.create_collection(COLLECTION, 100, "test_tx_hash")
+
+    collection = db.get_collection("test_collection_001")
+    assert collection["name"] == "Test NFT Collection"
+    assert collection["issuer"] == "celestia1testissuer"
+    assert db.get_nft("test_collection_001", 2).owner == "celestia1testissuer"
+    assert db.count_nfts_by_collection("test_collection_001") == 2
+    db.close()
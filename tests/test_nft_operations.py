@@ -0,0 +1,102 @@
+"""
+Tests for mint_many's sequence handling in scripts/nft_operations.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+import pytest
+
+from scripts import docker_blob_client, nft_operations
+
+
+class FakeClient:
+    """Stands in for DockerBlobClient; rejects the broadcast at `reject_at`"""
+
+    def __init__(self, sequence, reject_at=None):
+        self.sequence = sequence
+        self.reject_at = reject_at
+        self.broadcasts = []
+
+    def get_account_sequence(self, account):
+        return self.sequence
+
+    def broadcast_blob(self, data, from_account="alice", sequence=None):
+        self.broadcasts.append((data['nft_id'], sequence))
+        if len(self.broadcasts) - 1 == self.reject_at:
+            return None
+        return {'txhash': f"TX{sequence}", 'data': data}
+
+    def await_confirmation(self, pending):
+        return {**pending, 'height': 100}
+
+
+@pytest.fixture
+def items():
+    return [{'nft_id': i, 'to_address': f"celestia1to{i}"} for i in range(1, 5)]
+
+
+@pytest.fixture(autouse=True)
+def no_docker(monkeypatch):
+    monkeypatch.setattr(nft_operations, 'get_address', lambda key: f"celestia1{key}")
+    monkeypatch.setattr(docker_blob_client, 'get_address', lambda key: f"celestia1{key}")
+
+
+def test_mint_many_uses_consecutive_sequences(monkeypatch, items):
+    client = FakeClient(sequence=7)
+    monkeypatch.setattr(nft_operations, '_get_client', lambda: client)
+
+    results = nft_operations.mint_many("COL", items)
+
+    assert client.broadcasts == [(1, 7), (2, 8), (3, 9), (4, 10)]
+    assert [r['txhash'] for r in results] == ["TX7", "TX8", "TX9", "TX10"]
+    assert all(r['height'] == 100 for r in results)
+
+
+def test_mint_many_stops_at_first_rejected_broadcast(monkeypatch, items):
+    client = FakeClient(sequence=7, reject_at=1)
+    monkeypatch.setattr(nft_operations, '_get_client', lambda: client)
+
+    results = nft_operations.mint_many("COL", items)
+
+    # Nothing after the rejected tx is broadcast: it would leave a sequence gap
+    assert client.broadcasts == [(1, 7), (2, 8)]
+    assert results[0]['txhash'] == "TX7"
+    assert results[1:] == [None, None, None]
+
+
+@pytest.mark.parametrize("output", [
+    # cosmos-sdk 0.46 (celestia-app v1/v2)
+    {"@type": "/cosmos.auth.v1beta1.BaseAccount", "address": "celestia1alice",
+     "account_number": "3", "sequence": "12"},
+    # cosmos-sdk 0.50
+    {"account": {"type": "/cosmos.auth.v1beta1.BaseAccount",
+                 "value": {"address": "celestia1alice", "sequence": "12"}}},
+    {"account": {"@type": "/cosmos.auth.v1beta1.BaseAccount",
+                 "address": "celestia1alice", "sequence": "12"}},
+    # vesting account
+    {"@type": "/cosmos.vesting.v1beta1.ContinuousVestingAccount",
+     "base_vesting_account": {"base_account": {"address": "celestia1alice",
+                                               "sequence": "12"}}},
+])
+def test_get_account_sequence_parses_cli_output(monkeypatch, output):
+    client = docker_blob_client.DockerBlobClient()
+    calls = []
+
+    def fake_exec(argv, timeout=30):
+        calls.append(argv)
+        return orjson.dumps(output).decode()
+
+    monkeypatch.setattr(client, '_docker_exec', fake_exec)
+
+    assert client.get_account_sequence("alice") == 12
+    assert calls == [['celestia-appd', 'query', 'auth', 'account', 'celestia1alice',
+                      '--output', 'json']]
+
+
+def test_get_account_sequence_new_account(monkeypatch):
+    client = docker_blob_client.DockerBlobClient()
+    monkeypatch.setattr(client, '_docker_exec', lambda argv, timeout=30: '{"account": {}}')
+
+    assert client.get_account_sequence("alice") == 0